@@ -0,0 +1,181 @@
+import numpy as np
+from sprites import ATLAS, blit_layer, scaled_radius
+
+
+class ArrowPool:
+    # Preallocated arrow storage. Slots are recycled through a free list so
+    # firing and hitting never allocate, and all arrows move in one array op
+    def __init__(self, capacity=64, radius=5, color=(255, 255, 255)):
+        self.radius = radius
+        self.color = color
+        self.count = 0
+        self.top = 0  # One past the highest slot handed out since the pool was last empty
+        self._allocate(capacity)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def _allocate(self, capacity):
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.dx = np.zeros(capacity, dtype=np.float64)
+        self.dy = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.age = np.zeros(capacity, dtype=np.float64)  # In 60 Hz steps, like speed
+        # Positions at the start of the current tick, for render interpolation
+        self.px = np.zeros(capacity, dtype=np.float64)
+        self.py = np.zeros(capacity, dtype=np.float64)
+
+    def _columns(self):
+        return (self.x, self.y, self.dx, self.dy, self.speed, self.active, self.age, self.px, self.py)
+
+    def _grow(self):
+        old = self._columns()
+        capacity = len(self.x)
+        self._allocate(capacity * 2)
+        for new, prev in zip(self._columns(), old):
+            new[:capacity] = prev
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def fire(self, x, y, dx, dy, speed):
+        if not self.free:
+            self._grow()
+        i = self.free.pop()
+        self.x[i] = self.px[i] = x
+        self.y[i] = self.py[i] = y
+        self.dx[i] = dx
+        self.dy[i] = dy
+        self.speed[i] = speed
+        self.age[i] = 0.0
+        self.active[i] = True
+        self.count += 1
+        if i >= self.top:
+            self.top = i + 1
+        return i
+
+    def release(self, slots):
+        # Return a batch of slots to the free list
+        slots = np.unique(slots)
+        slots = slots[self.active[slots]]
+        if len(slots) == 0:
+            return
+        self.active[slots] = False
+        self.free.extend(slots.tolist())
+        self.count -= len(slots)
+        if self.count == 0:
+            # Pool drained, start handing out low slots again
+            self.top = 0
+            self.free = list(range(len(self.x) - 1, -1, -1))
+
+    def clear(self):
+        self.active[:] = False
+        self.count = 0
+        self.top = 0
+        self.free = list(range(len(self.x) - 1, -1, -1))
+
+    def live_slots(self):
+        return np.flatnonzero(self.active[:self.top])
+
+    def snapshot(self):
+        top = self.top
+        self.px[:top] = self.x[:top]
+        self.py[:top] = self.y[:top]
+
+    def update(self, steps=1.0):
+        # Move every live arrow along its direction, speed is in pixels per
+        # 60 Hz step and steps is how many of those this tick covers
+        slots = self.live_slots()
+        self.x[slots] += self.dx[slots] * self.speed[slots] * steps
+        self.y[slots] += self.dy[slots] * self.speed[slots] * steps
+        self.age[slots] += steps
+
+    def enforce(self, budget, cx, cy, steps_per_second):
+        # Release arrows past the budget's age or range from (cx, cy), then
+        # the oldest or farthest of what is left over its count. Returns how
+        # many were released
+        slots = self.live_slots()
+        if len(slots) == 0:
+            return 0
+        dist_sq = (self.x[slots] - cx) ** 2 + (self.y[slots] - cy) ** 2
+        drop = np.zeros(len(slots), dtype=bool)
+        if budget.max_age is not None:
+            drop |= self.age[slots] > budget.max_age * steps_per_second
+        if budget.max_range is not None:
+            drop |= dist_sq > budget.max_range * budget.max_range
+        if budget.max_count is not None and len(slots) - drop.sum() > budget.max_count:
+            if budget.policy == 'oldest':
+                key = -self.age[slots]
+            elif budget.policy == 'farthest':
+                key = -dist_sq
+            else:
+                raise ValueError(f"arrows cannot be evicted by {budget.policy!r}")
+            kept = np.flatnonzero(~drop)
+            excess = len(kept) - budget.max_count
+            drop[kept[np.argsort(key[kept], kind='stable')[:excess]]] = True
+        released = int(drop.sum())
+        if released:
+            self.release(slots[drop])
+        return released
+
+    def hit_test(self, swarm):
+        # Broad phase through the swarm's cell grid, then an exact box overlap
+        # test on the candidates. Returns (arrow slots, enemy indices) with each
+        # arrow and each enemy used at most once
+        empty = np.empty(0, dtype=np.intp)
+        if self.count == 0 or len(swarm) == 0:
+            return empty, empty
+        slots = self.live_slots()
+        ax = self.x[slots]
+        ay = self.y[slots]
+        grid = swarm.ensure_grid()
+        arrow_idx, enemy_idx = grid.neighbours(ax, ay)
+        if len(arrow_idx) == 0:
+            return empty, empty
+        r = self.radius
+        ex = swarm.x[enemy_idx]
+        ey = swarm.y[enemy_idx]
+        er = swarm.radius[enemy_idx]
+        hx = ax[arrow_idx]
+        hy = ay[arrow_idx]
+        hit = ((hx - r < ex + er) & (hx + r > ex - er)
+               & (hy - r < ey + er) & (hy + r > ey - er))
+        if not hit.any():
+            return empty, empty
+        arrow_idx = arrow_idx[hit]
+        enemy_idx = enemy_idx[hit]
+        # Each arrow takes its closest enemy
+        dist_sq = (hx[hit] - ex[hit]) ** 2 + (hy[hit] - ey[hit]) ** 2
+        order = np.lexsort((dist_sq, arrow_idx))
+        arrow_idx = arrow_idx[order]
+        enemy_idx = enemy_idx[order]
+        _, first = np.unique(arrow_idx, return_index=True)
+        arrow_idx = arrow_idx[first]
+        enemy_idx = enemy_idx[first]
+        # An enemy can only die once, extra arrows on it fly on
+        enemy_idx, first = np.unique(enemy_idx, return_index=True)
+        return slots[arrow_idx[first]], enemy_idx
+
+    def visible(self, view):
+        # Live slots whose arrow overlaps the view rect
+        slots = self.live_slots()
+        r = self.radius
+        x = self.x[slots]
+        y = self.y[slots]
+        inside = ((x + r >= view.left) & (x - r < view.right)
+                  & (y + r >= view.top) & (y - r < view.bottom))
+        return slots[inside]
+
+    def draw(self, screen, offset_x, offset_y, slots=None, alpha=1.0, scale=1.0):
+        if slots is None:
+            slots = self.live_slots()
+        if len(slots) == 0:
+            return
+        px = self.px[slots]
+        py = self.py[slots]
+        x = px + (self.x[slots] - px) * alpha
+        y = py + (self.y[slots] - py) * alpha
+        radius = scaled_radius(self.radius, scale)
+        sprite = ATLAS.get('circle', radius, self.color)
+        blit_layer(screen, sprite, (x - offset_x) * scale, (y - offset_y) * scale, radius)
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,195 @@
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import pygame
+from text_cache import get_font
+
+# Asset paths are looked up relative to the working directory first, then the
+# project folder above this package (where assets/ lives in the repo)
+ASSET_DIRS = (os.getcwd(), os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scaled images are cached here between launches, raw RGB so loading is a copy
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache"),
+                         "dark_messiah")
+
+# Preload priorities, lower numbers load first
+PRIORITY_MENU = 0
+PRIORITY_GAME = 1
+
+# Posted to the pygame event queue whenever a preloaded asset is ready
+ASSET_LOADED = pygame.USEREVENT + 1
+
+
+def get_cover_surface(image, target_width, target_height):
+    img_width, img_height = image.get_size()
+    scale = max(target_width / img_width, target_height / img_height)
+    new_size = (int(img_width * scale), int(img_height * scale))
+    scaled_img = pygame.transform.smoothscale(image, new_size)
+    # Crop to center
+    x = (scaled_img.get_width() - target_width) // 2
+    y = (scaled_img.get_height() - target_height) // 2
+    return scaled_img.subsurface((x, y, target_width, target_height)).copy()
+
+
+class AssetManager:
+    # Images and fonts are loaded the first time they are asked for, not at
+    # import. Scaled variants are also cached on disk keyed by the source
+    # file's hash and the target size, so later launches skip the rescale
+    def __init__(self, search_dirs=ASSET_DIRS, cache_dir=CACHE_DIR):
+        self.search_dirs = search_dirs
+        self.cache_dir = cache_dir
+        self.images = {}
+        self.failed = set()
+
+    def find(self, path):
+        if os.path.isabs(path):
+            return path if os.path.exists(path) else None
+        for base in self.search_dirs:
+            candidate = os.path.join(base, path)
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def font(self, path, size):
+        # Missing font files fall back to the default font
+        found = self.find(path) if path else None
+        return get_font(found, size)
+
+    def image(self, path):
+        # Decoded image or None if it can't be loaded (reported once)
+        if path in self.images:
+            return self.images[path]
+        if path in self.failed:
+            return None
+        found = self.find(path)
+        try:
+            if found is None:
+                raise FileNotFoundError(f"No file '{path}' found in {', '.join(self.search_dirs)}")
+            image = pygame.image.load(found)
+        except (OSError, pygame.error) as e:
+            print(f"Failed to load {path}: {e}")
+            self.failed.add(path)
+            return None
+        self.images[path] = image
+        return image
+
+    def cover_image(self, path, width, height):
+        # Image scaled and centre-cropped to exactly cover width x height
+        key = (path, width, height)
+        if key in self.images:
+            return self.images[key]
+        if path in self.failed:
+            return None
+        found = self.find(path)
+        surface = None
+        cache_file = None
+        if found is not None:
+            cache_file = self.cache_path(found, width, height)
+            surface = self.load_cached(cache_file, width, height)
+        if surface is None:
+            image = self.image(path)
+            if image is None:
+                return None
+            surface = get_cover_surface(image, width, height)
+            if cache_file is not None:
+                self.save_cached(cache_file, surface)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.images[key] = surface
+        return surface
+
+    def cache_path(self, source, width, height):
+        with open(source, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}_{width}x{height}.rgb")
+
+    def load_cached(self, cache_file, width, height):
+        try:
+            with open(cache_file, 'rb') as f:
+                data = f.read()
+            return pygame.image.frombuffer(data, (width, height), 'RGB').copy()
+        except (OSError, ValueError, pygame.error):
+            return None
+
+    def save_cached(self, cache_file, surface):
+        # Best effort, a read-only cache dir just means rescaling next launch
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cache_file + ".tmp"
+            with open(tmp, 'wb') as f:
+                f.write(pygame.image.tobytes(surface, 'RGB'))
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+
+
+class AssetPreloader:
+    # Runs asset loaders on a few worker threads so decoding and scaling
+    # happen while the menu is already up. Jobs are picked by priority, then
+    # in submission order. Every finished job posts an ASSET_LOADED event so
+    # an idle main loop wakes up to show the new asset
+    def __init__(self, workers=2, notify=True):
+        self.notify = notify
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        self.results = {}
+        self.events = {}  # key -> threading.Event, set once the job finished
+        self.total = 0
+        self.done = 0
+        self.threads = [threading.Thread(target=self.work, daemon=True, name=f"asset-loader-{i}")
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, loader, priority=PRIORITY_GAME):
+        # loader() runs on a worker, its return value is stored under key
+        with self.lock:
+            if key in self.events:
+                return
+            self.events[key] = threading.Event()
+            self.total += 1
+        self.queue.put((priority, next(self.order), key, loader))
+
+    def work(self):
+        while True:
+            priority, _, key, loader = self.queue.get()
+            if loader is None:
+                return
+            try:
+                value = loader()
+            except Exception as e:
+                print(f"Failed to preload {key}: {e}")
+                value = None
+            with self.lock:
+                self.results[key] = value
+                self.done += 1
+            self.events[key].set()
+            if self.notify and pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(ASSET_LOADED, key=key))
+
+    def get(self, key):
+        # The loaded value, None while it is still loading (or failed)
+        return self.results.get(key)
+
+    def ready(self, key):
+        event = self.events.get(key)
+        return event is not None and event.is_set()
+
+    def progress(self):
+        with self.lock:
+            return self.done, self.total
+
+    def ensure_loaded(self, keys=None):
+        # Block until the given keys, or everything submitted so far, are done
+        if keys is None:
+            keys = list(self.events)
+        for key in keys:
+            self.events[key].wait()
+
+    def shutdown(self):
+        # Workers stop after whatever higher priority work is still queued
+        for _ in self.threads:
+            self.queue.put((float('inf'), next(self.order), None, None))
@@ -0,0 +1,218 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from player import ArcaneMage, BASE_TICK_RATE, Controls
+from simulation import Simulation, LEVEL_SCALING
+
+# Headless balance sweeps: many bot-played runs over a grid of difficulty
+# parameters, spread over every core.
+#
+#   python batch.py --runs 200
+#   python batch.py --spawn-time 1.0,1.5,2.0 --enemy-speed 2,3 --policy kite,stand
+#   python batch.py --strategy offense,defense --csv runs.csv
+
+SIM_RATE = 60
+DT = 1.0 / SIM_RATE
+MAX_TIME = 600.0  # Runs still alive after this many seconds count as survived
+THREAT_RANGE = 250  # Enemies closer than this steer the kiting bot
+SPRINT_RANGE = 80  # and closer than this make it sprint
+
+
+# Movement policies map the current state to this tick's Controls, memory is
+# a dict the policy can keep per-run state in
+
+def stand_policy(sim, rng, memory):
+    return Controls()
+
+
+def kite_policy(sim, rng, memory):
+    # Walk away from the nearby enemies, weighted towards the closest ones
+    player = sim.player
+    enemies = sim.enemies
+    near = enemies.nearest(player.x, player.y, 8, THREAT_RANGE)
+    if len(near) == 0:
+        return Controls()
+    dx = player.x - enemies.x[near]
+    dy = player.y - enemies.y[near]
+    dist = (dx * dx + dy * dy) ** 0.5 + 1e-6
+    away_x = (dx / (dist * dist)).sum()
+    away_y = (dy / (dist * dist)).sum()
+    # Only press a direction that clearly helps, diagonal moves are allowed
+    norm = math.hypot(away_x, away_y) or 1.0
+    away_x /= norm
+    away_y /= norm
+    return Controls(up=away_y < -0.38, down=away_y > 0.38, left=away_x < -0.38, right=away_x > 0.38,
+                    sprint=bool(dist.min() < SPRINT_RANGE))
+
+
+def wander_policy(sim, rng, memory):
+    # Random direction held for about a second, a noisy human baseline
+    # A run loaded from a save starts at any tick, pick a direction right away
+    if 'controls' not in memory or sim.ticks % SIM_RATE == 0:
+        memory['controls'] = Controls(up=rng.random() < 0.3, down=rng.random() < 0.3,
+                                      left=rng.random() < 0.3, right=rng.random() < 0.3)
+    return memory['controls']
+
+
+POLICIES = {
+    'stand': stand_policy,
+    'kite': kite_policy,
+    'wander': wander_policy,
+}
+
+# Upgrade strategies are priority lists, the first upgrade still available wins
+STRATEGIES = {
+    'offense': ('arrow_count', 'arrow_damage', 'arrow_speed', 'health', 'magnet',
+                'sprint_speed', 'sprint_duration', 'sprint_cooldown'),
+    'defense': ('health', 'magnet', 'sprint_duration', 'sprint_cooldown', 'sprint_speed',
+                'arrow_count', 'arrow_damage', 'arrow_speed'),
+    'balanced': None,  # Lowest current level first
+    'random': None,
+}
+
+
+def pick_upgrade(strategy, available, rng):
+    if strategy == 'random':
+        return rng.choice(sorted(available))
+    if strategy == 'balanced':
+        return min(available, key=lambda key: (available[key]['current_level'], key))
+    for key in STRATEGIES[strategy]:
+        if key in available:
+            return key
+    return next(iter(available))
+
+
+def play_bot(sim, policy, strategy, rng, max_ticks):
+    # Step sim with a bot until the run ends or reaches max_ticks. policy and
+    # strategy are names from POLICIES and STRATEGIES, rng drives both
+    move = POLICIES[policy]
+    memory = {}
+    while not sim.game_over and sim.ticks < max_ticks:
+        if sim.level_up_pending:
+            available = sim.player.get_available_upgrades()
+            if available:
+                sim.choose_upgrade(pick_upgrade(strategy, available, rng))
+            else:
+                sim.level_up_pending = False
+        sim.shoot()  # Auto-shoot, the arrow cooldown does the gating
+        sim.step(DT, move(sim, rng, memory))
+    return sim
+
+
+def run_one(config):
+    # One bot-played run, returns its outcome as a flat dict
+    sim = Simulation(base_enemy_spawn_time=config['spawn_time'], base_enemy_speed=config['enemy_speed'],
+                     level_scaling=config['scaling'], seed=config['seed'])
+    play_bot(sim, config['policy'], config['strategy'], random.Random(config['seed']),
+             int(config['max_time'] * SIM_RATE))
+    result = dict(config)
+    kills = sim.player.kills if isinstance(sim.player, ArcaneMage) else 0
+    result.update(survival=sim.ticks / SIM_RATE, survived=not sim.game_over, level=sim.player.level,
+                  xp=sim.experience_earned(), kills=kills, hits_taken=sim.enemies_defeated, ticks=sim.ticks)
+    return result
+
+
+def build_configs(args):
+    grid = itertools.product(args.spawn_time, args.enemy_speed, args.scaling, args.policy, args.strategy)
+    configs = []
+    for spawn_time, enemy_speed, scaling, policy, strategy in grid:
+        for run in range(args.runs):
+            configs.append({'spawn_time': spawn_time, 'enemy_speed': enemy_speed, 'scaling': scaling,
+                            'policy': policy, 'strategy': strategy, 'seed': args.seed + run,
+                            'max_time': args.max_time})
+    return configs
+
+
+GRID_KEYS = ('spawn_time', 'enemy_speed', 'scaling', 'policy', 'strategy')
+
+
+def summarize(results):
+    # One row per grid point, the same seeds are used at every point
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[key] for key in GRID_KEYS), []).append(result)
+    rows = []
+    for key, runs in groups.items():
+        survival = [r['survival'] for r in runs]
+        rows.append(dict(zip(GRID_KEYS, key), runs=len(runs),
+                         survival_mean=statistics.fmean(survival),
+                         survival_median=statistics.median(survival),
+                         survived=sum(r['survived'] for r in runs) / len(runs),
+                         level=statistics.fmean(r['level'] for r in runs),
+                         xp=statistics.fmean(r['xp'] for r in runs),
+                         kills=statistics.fmean(r['kills'] for r in runs)))
+    return rows
+
+
+def print_table(rows):
+    print(f"{'spawn':>6} {'speed':>6} {'scale':>6} {'policy':<7} {'strategy':<9} {'runs':>5} "
+          f"{'surv mean':>10} {'median':>8} {'alive%':>7} {'level':>6} {'xp':>8} {'kills':>7}")
+    for row in rows:
+        print(f"{row['spawn_time']:>6g} {row['enemy_speed']:>6g} {row['scaling']:>6g} {row['policy']:<7} "
+              f"{row['strategy']:<9} {row['runs']:>5} {row['survival_mean']:>9.1f}s {row['survival_median']:>7.1f}s "
+              f"{row['survived']:>7.0%} {row['level']:>6.1f} {row['xp']:>8.0f} {row['kills']:>7.1f}")
+
+
+def floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def names(choices):
+    def parse(text):
+        values = text.split(",")
+        unknown = [v for v in values if v not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (choose from {', '.join(choices)})")
+        return values
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many headless bot games over a parameter grid")
+    parser.add_argument('--spawn-time', type=floats, default=[1.5], help="base enemy spawn times, comma separated")
+    parser.add_argument('--enemy-speed', type=floats, default=[2.0], help="base enemy speeds")
+    parser.add_argument('--scaling', type=floats, default=[LEVEL_SCALING], help="per-5-levels difficulty multipliers")
+    parser.add_argument('--policy', type=names(POLICIES), default=['kite'], help=", ".join(POLICIES))
+    parser.add_argument('--strategy', type=names(STRATEGIES), default=['offense'], help=", ".join(STRATEGIES))
+    parser.add_argument('--runs', type=int, default=100, help="runs per grid point")
+    parser.add_argument('--seed', type=int, default=0, help="first seed, run i uses seed + i")
+    parser.add_argument('--max-time', type=float, default=MAX_TIME, help="simulated seconds before a run is cut off")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--csv', help="also write every run's result to this file")
+    args = parser.parse_args(argv)
+
+    configs = build_configs(args)
+    start = time.perf_counter()
+    if args.workers > 1:
+        # Runs are short, hand them out in chunks to keep the pool overhead down
+        chunksize = max(1, len(configs) // (args.workers * 8))
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(run_one, configs, chunksize=chunksize))
+    else:
+        results = [run_one(config) for config in configs]
+    elapsed = time.perf_counter() - start
+
+    print_table(summarize(results))
+    ticks = sum(r['ticks'] for r in results)
+    print(f"{len(results)} runs, {ticks} ticks in {elapsed:.1f}s on {args.workers} worker(s): "
+          f"{len(results) / elapsed:.1f} runs/s, {ticks / elapsed:.0f} ticks/s "
+          f"({ticks / elapsed / BASE_TICK_RATE:.0f}x real time)")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Wrote {len(results)} runs to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
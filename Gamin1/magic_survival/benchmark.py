@@ -0,0 +1,271 @@
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from player import BASE_TICK_RATE
+from simulation import Simulation
+from budgets import default_budgets, unbounded_budgets, BUDGET_CHECK_TIME
+from savestate import restore_state
+
+# Microbenchmarks for the simulation hot paths. Every scenario is seeded so
+# two runs on the same machine measure the same work.
+#
+#   python benchmark.py                          run everything
+#   python benchmark.py --only separate --sizes 1000,10000
+#   python benchmark.py --save baseline.json     record a baseline
+#   python benchmark.py --compare baseline.json  flag regressions (exit 1)
+#   python benchmark.py --state late.dms         measure from a saved run
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DT = 1 / 60
+
+
+def build_scenario(enemies, orbs=0, arrows=0, seed=1234, spread=1200, invulnerable=False, budgets=None):
+    # A run frozen mid-game: enemies scattered around the player, orbs lying
+    # about and arrows in flight in random directions. Budgets are off unless
+    # given so eviction doesn't change the load between calls
+    # invulnerable keeps full-tick scenarios from ending in a game over
+    # mid-measurement
+    sim = Simulation(seed=seed, budgets=budgets or unbounded_budgets(), invulnerable=invulnerable)
+    rng = sim.rng
+    for _ in range(enemies):
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(40, spread)
+        sim.enemies.spawn(dist * math.cos(angle), dist * math.sin(angle), speed=sim.base_enemy_speed)
+    for _ in range(orbs):
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(0, spread)
+        sim.orbs.spawn(dist * math.cos(angle), dist * math.sin(angle))
+    for _ in range(arrows):
+        angle = rng.uniform(0, 2 * math.pi)
+        sim.player.arrows.fire(0, 0, math.cos(angle), math.sin(angle), sim.player.arrow_speed)
+    return sim
+
+
+# Each benchmark takes a scenario size and returns (setup, call) or (setup,
+# call, prepare): setup builds fresh state for a round, call runs the measured
+# operation once on it. prepare(state) returns a reset that puts state back
+# before every call, untimed, for calls that change their own input
+
+def bench_enemy_update(size):
+    def call(sim):
+        sim.enemies.update(sim.player.x, sim.player.y, DT * BASE_TICK_RATE)
+    return (lambda: build_scenario(size)), call
+
+
+def bench_separate(size):
+    # Every call starts from the same overlapping placement, not from the
+    # previous call's already pushed apart horde
+    def prepare(sim):
+        enemies = sim.enemies
+        x, y = enemies.x.copy(), enemies.y.copy()
+
+        def reset():
+            enemies.x[:] = x
+            enemies.y[:] = y
+            enemies.grid_dirty = True
+        return reset
+
+    def call(sim):
+        sim.enemies.separate()
+    return (lambda: build_scenario(size)), call, prepare
+
+
+def bench_enemy_step(size, lod=True):
+    # Move, separate and contact for a horde strung out behind a kiting
+    # player, most of it beyond the level-of-detail radius
+    def setup():
+        return build_scenario(size, spread=4000)
+
+    def call(sim):
+        sim.enemy_lod = lod
+        sim.ticks += 1
+        sim.update_enemies(sim.player_rect(), DT)
+    return setup, call
+
+
+def bench_spawn_burst(size):
+    # A stress-test burst: size enemies owed in a single tick, into a swarm
+    # emptied before every call
+    def prepare(sim):
+        def reset():
+            sim.enemies.clear()
+            sim.spawner.clear()
+        return reset
+
+    def call(sim):
+        sim.spawner.burst(size)
+        sim.spawn_enemies(0.0)
+    return (lambda: build_scenario(0)), call, prepare
+
+
+def bench_shoot_arrow(size):
+    def call(sim):
+        sim.player.arrow_cooldown = 0
+        sim.player.shoot_arrow(sim.enemies)
+    return (lambda: build_scenario(size)), call
+
+
+def bench_update_arrow(size):
+    # One arrow per ten enemies in flight
+    def call(sim):
+        sim.player.update_arrow(DT, sim.enemies)
+    return (lambda: build_scenario(size, arrows=max(1, size // 10))), call
+
+
+def bench_collect_orbs(size):
+    def call(sim):
+        sim.collect_orbs(sim.player_rect())
+    return (lambda: build_scenario(0, orbs=size)), call
+
+
+def bench_enforce_budgets(size):
+    # One budget check over orbs and arrows strewn past the default ranges
+    def setup():
+        return build_scenario(0, orbs=size, arrows=max(1, size // 10), spread=5000, budgets=default_budgets())
+
+    def call(sim):
+        sim.budget_timer = BUDGET_CHECK_TIME
+        sim.enforce_budgets(0.0)
+    return setup, call
+
+
+def bench_tick(size):
+    def call(sim):
+        sim.step(DT)
+        if sim.level_up_pending:
+            sim.choose_upgrade(next(iter(sim.player.get_available_upgrades())))
+    return (lambda: build_scenario(size, orbs=size, arrows=max(1, size // 10), invulnerable=True)), call
+
+
+BENCHMARKS = {
+    'enemy_update': bench_enemy_update,
+    'separate': bench_separate,
+    'enemy_step': bench_enemy_step,
+    'enemy_step_full': lambda size: bench_enemy_step(size, lod=False),
+    'spawn_burst': bench_spawn_burst,
+    'shoot_arrow': bench_shoot_arrow,
+    'update_arrow': bench_update_arrow,
+    'collect_orbs': bench_collect_orbs,
+    'enforce_budgets': bench_enforce_budgets,
+    'tick': bench_tick,
+}
+
+
+def measure(setup, call, rounds, calls, prepare=None):
+    # Per-call timings in milliseconds, state rebuilt every round so
+    # destructive calls (kills, pickups) keep measuring the same load, and
+    # reset before every call when the benchmark has a prepare
+    samples = []
+    for _ in range(rounds):
+        state = setup()
+        reset = prepare(state) if prepare else None
+        if reset:
+            reset()
+        call(state)  # Warm-up
+        for _ in range(calls):
+            if reset:
+                reset()
+            start = time.perf_counter()
+            call(state)
+            samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'min_ms': ordered[0],
+        'median_ms': statistics.median(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'stdev_ms': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def run(names, sizes, rounds, calls, state=None):
+    # With state, every round starts from that save state instead of a
+    # built scenario. Benchmarks that make their own load (spawn_burst) are
+    # sized by the state's enemy count
+    results = {}
+    if state:
+        with open(state, 'rb') as f:
+            data = f.read()
+        state_size = max(1, len(restore_state(data).enemies))
+    for name in names:
+        for size in (['state'] if state else sizes):
+            setup, call, *prepare = BENCHMARKS[name](state_size if state else size)
+            if state:
+                setup = lambda: restore_state(data, unbounded_budgets())
+            stats = summarize(measure(setup, call, rounds, calls, *prepare))
+            key = f"{name}[{size}]"
+            results[key] = stats
+            print(f"{key:<22} median {stats['median_ms']:9.4f} ms  p95 {stats['p95_ms']:9.4f} ms  "
+                  f"min {stats['min_ms']:9.4f} ms  stdev {stats['stdev_ms']:8.4f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Median is the compared figure, it is the most stable under noise
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        change = stats['median_ms'] / base['median_ms'] - 1 if base['median_ms'] > 0 else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{key:<22} {base['median_ms']:9.4f} -> {stats['median_ms']:9.4f} ms  {change:+7.1%}  {flag}")
+        if change > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    parser.add_argument('--only', help="comma separated benchmark names: " + ", ".join(BENCHMARKS))
+    parser.add_argument('--sizes', default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated entity counts")
+    parser.add_argument('--rounds', type=int, default=5, help="fresh scenarios per benchmark")
+    parser.add_argument('--calls', type=int, default=20, help="timed calls per round")
+    parser.add_argument('--state', help="start every round from this save state (see savestate.py) instead")
+    parser.add_argument('--save', help="write results as a JSON baseline")
+    parser.add_argument('--compare', help="JSON baseline to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative median slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    results = run(names, sizes, args.rounds, args.calls, args.state)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'rounds': args.rounds,
+                'calls': args.calls,
+                'results': results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
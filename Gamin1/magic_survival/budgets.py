@@ -0,0 +1,46 @@
+# Limits on how long, how far from the player and how many of an entity kind
+# may stay alive. Without them missed arrows fly on forever and orbs the
+# player walked away from pile up, so memory and per-tick work grow with the
+# length of a run
+
+# What goes when a kind is over its count:
+#   oldest    the longest-lived first
+#   farthest  the farthest from the player first
+#   merge     orbs only, the oldest are folded into a neighbour, XP is kept
+EVICTION_POLICIES = ('oldest', 'farthest', 'merge')
+
+# Budgets are checked every this many simulated seconds rather than every
+# tick, the orb checks walk the whole field
+BUDGET_CHECK_TIME = 0.5
+
+
+class EntityBudget:
+    # Any limit left at None is not enforced. max_age is in seconds, max_range
+    # in world pixels from the player
+    def __init__(self, max_count=None, max_age=None, max_range=None, policy='oldest', merge_radius=256):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"unknown eviction policy {policy!r} (choose from {', '.join(EVICTION_POLICIES)})")
+        self.max_count = max_count
+        self.max_age = max_age
+        self.max_range = max_range
+        self.policy = policy
+        self.merge_radius = merge_radius  # How far a merged orb looks for a neighbour
+
+    def __repr__(self):
+        return (f"EntityBudget(max_count={self.max_count}, max_age={self.max_age}, "
+                f"max_range={self.max_range}, policy={self.policy!r})")
+
+
+def default_budgets():
+    # Arrows are out of sight well before 3 s or 2000 px. Orbs are capped by
+    # count and merged so the XP on the map is kept, and dropped once the
+    # player is far enough away that they are effectively lost
+    return {
+        'arrows': EntityBudget(max_count=256, max_age=3.0, max_range=2000, policy='oldest'),
+        'orbs': EntityBudget(max_count=400, max_range=4000, policy='merge'),
+    }
+
+
+def unbounded_budgets():
+    # The behaviour before budgets existed, for comparisons
+    return {'arrows': EntityBudget(), 'orbs': EntityBudget()}
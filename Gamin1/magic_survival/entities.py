@@ -0,0 +1,73 @@
+from array import array
+
+GENERATION_SHIFT = 32
+SLOT_MASK = (1 << GENERATION_SHIFT) - 1
+
+
+class EntityStore:
+    # Records packed in a dense list for fast iteration, addressed through
+    # generational handles. A handle is slot | generation << 32; a slot's
+    # generation goes up every time it is freed, so a handle kept past its
+    # record's removal resolves to None rather than to whatever reused the
+    # slot. Removal swaps the last record into the hole, O(1).
+    # Records need a `handle` attribute, the store keeps it up to date.
+    # The index tables are typed arrays, 8 bytes an entry instead of a list
+    # slot plus an int object
+    def __init__(self):
+        self.items = []  # Dense records
+        self.slots = array('q')  # Dense index -> slot
+        self.dense = array('q')  # Slot -> dense index
+        self.generations = array('q')  # Slot -> generation
+        self.free = array('q')
+
+    def add(self, item):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.dense)
+            self.dense.append(0)
+            self.generations.append(0)
+        self.dense[slot] = len(self.items)
+        self.items.append(item)
+        self.slots.append(slot)
+        item.handle = slot | self.generations[slot] << GENERATION_SHIFT
+        return item.handle
+
+    def get(self, handle):
+        slot = handle & SLOT_MASK
+        if slot >= len(self.generations) or self.generations[slot] != handle >> GENERATION_SHIFT:
+            return None
+        return self.items[self.dense[slot]]
+
+    def remove(self, item):
+        # False if item was already removed
+        handle = item.handle
+        if self.get(handle) is not item:
+            return False
+        slot = handle & SLOT_MASK
+        i = self.dense[slot]
+        last = len(self.items) - 1
+        if i != last:
+            moved_slot = self.slots[last]
+            self.items[i] = self.items[last]
+            self.slots[i] = moved_slot
+            self.dense[moved_slot] = i
+        self.items.pop()
+        self.slots.pop()
+        self.generations[slot] += 1
+        self.free.append(slot)
+        return True
+
+    def clear(self):
+        # Bumping every generation keeps outstanding handles from resolving
+        for slot in self.slots:
+            self.generations[slot] += 1
+            self.free.append(slot)
+        self.items = []
+        self.slots = array('q')
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
@@ -1,22 +1,32 @@
 import pygame
+import math
+import os
 import sys
-from pygame.locals import *
-from player import Player
-from orb import Orb
-from enemy import Enemy
 import random
-import math
 import time
+import argparse
+from pygame.locals import *
+from player import ArcaneMage, Controls
+from simulation import Simulation
+from orb import draw_orbs, ORB_BASE_RADIUS, ORB_MAX_RADIUS
+from text_cache import get_font, render_text, TextLabel, clear_text_cache
+from profiler import FrameProfiler, ProfilerOverlay, NULL_PROFILER
+from assets import AssetManager, AssetPreloader, ASSET_LOADED, PRIORITY_MENU, PRIORITY_GAME
+from sprites import ATLAS
+from replay import InputRecorder
+from pipeline import RenderSnapshot, SimulationWorker
+from telemetry import MemoryTelemetry
+from render_scale import AutoRenderScale, parse_render_scale
+from savestate import save_state, load_state
+from batch import POLICIES, STRATEGIES, pick_upgrade
+from stress import BUDGETS, parse_wave, frame_stats, check_budgets, report
 
-# Initialize Pygame
-# This is new
-pygame.init()
-
-# Get the screen info for fullscreen
-screen_info = pygame.display.Info()
-SCREEN_WIDTH = screen_info.current_w
-SCREEN_HEIGHT = screen_info.current_h
-FPS = 60
+FPS = 60  # Render rate cap, 0 for uncapped
+SIM_RATE = 60  # Simulation ticks per second
+MAX_FRAME_TIME = 0.25  # Longest frame fed to the simulation, avoids a catch-up spiral after a stall
+# Enemies get full updates out to half the screen diagonal plus this margin,
+# so the ones walking in from the edge are already at full rate
+LOD_VIEW_MARGIN = 250
 
 # Colors
 WHITE = (255, 255, 255)
@@ -30,30 +40,14 @@ YELLOW = (255, 255, 0)
 CYAN = (0, 255, 255)
 ORANGE = (255, 165, 0)
 
-# Load pixel font
-try:
-    PIXEL_FONT = pygame.font.Font("fonts/pixel.ttf", 32)  # You'll need to add this font
-except:
-    PIXEL_FONT = pygame.font.Font(None, 32)  # Fallback to default font
-
-def get_cover_surface(image, target_width, target_height):
-    img_width, img_height = image.get_size()
-    scale = max(target_width / img_width, target_height / img_height)
-    new_size = (int(img_width * scale), int(img_height * scale))
-    scaled_img = pygame.transform.smoothscale(image, new_size)
-    # Crop to center
-    x = (scaled_img.get_width() - target_width) // 2
-    y = (scaled_img.get_height() - target_height) // 2
-    return scaled_img.subsurface((x, y, target_width, target_height)).copy()
-
-# Load menu background image
-try:
-    raw_img = pygame.image.load("assets/menu_bg.jpg")
-    MENU_BG = get_cover_surface(raw_img, SCREEN_WIDTH, SCREEN_HEIGHT)
-    print("Menu background loaded successfully!")
-except Exception as e:
-    MENU_BG = None
-    print(f"Failed to load menu background: {e}")
+# Loaded on first use, nothing is read from disk at import
+PIXEL_FONT_PATH = "fonts/pixel.ttf"  # You'll need to add this font, falls back to the default font
+MENU_BG_PATH = "assets/menu_bg.jpg"
+QUICKSAVE_PATH = "quicksave.dms"  # F5 saves the run here, F9 loads it back
+
+# Sprites the first running frame needs: enemies, arrows and every orb size
+GAME_SPRITES = ([('diamond', 15, (255, 0, 0)), ('circle', 5, (255, 255, 255))]
+                + [('circle', radius, (0, 128, 255)) for radius in range(ORB_BASE_RADIUS, ORB_MAX_RADIUS + 1)])
 
 # Game States
 STATE_MENU = 'menu'
@@ -64,19 +58,20 @@ STATE_DETAILS = 'details'
 STATE_LEVEL_UP = 'level_up'  # New state for level up screen
 STATE_ABOUT = 'about'  # New state for about screen
 
-# Arcane Mage Arrow Cooldown (in seconds)
-ARROW_COOLDOWN = 1.0
-
 class UpgradeButton:
     def __init__(self, rect, upgrade_key, upgrade_data, font):
         self.rect = pygame.Rect(rect)
         self.upgrade_key = upgrade_key
         self.upgrade_data = upgrade_data
         self.font = font
-        self.title = self.font.render(f"{upgrade_data['name']} (Level {upgrade_data['current_level']}/{upgrade_data['max_level']})", True, (255, 255, 255))
-        self.description = pygame.font.Font(None, 24).render(upgrade_data['description'], True, (200, 200, 200))
+        small_font = get_font(None, 24)
+        self.title = render_text(self.font, f"{upgrade_data['name']} (Level {upgrade_data['current_level']}/{upgrade_data['max_level']})", (255, 255, 255))
+        self.description = render_text(small_font, upgrade_data['description'], (200, 200, 200))
         self.title_rect = self.title.get_rect(topleft=(self.rect.x + 10, self.rect.y + 10))
         self.desc_rect = self.description.get_rect(topleft=(self.rect.x + 10, self.rect.y + 40))
+        # The effect only changes when the upgrade is applied, which replaces the buttons
+        self.effect = render_text(small_font, self.effect_text(), (0, 255, 0))
+        self.effect_rect = self.effect.get_rect(topleft=(self.rect.x + 10, self.rect.y + 70))
         self.hover = False
     
     def draw(self, screen):
@@ -90,6 +85,9 @@ class UpgradeButton:
         screen.blit(self.description, self.desc_rect)
         
         # Draw current effect
+        screen.blit(self.effect, self.effect_rect)
+
+    def effect_text(self):
         effect_text = ""
         if self.upgrade_key == 'arrow_count':
             effect_text = f"Current: {self.upgrade_data['current_level'] + 1} arrows"
@@ -105,74 +103,19 @@ class UpgradeButton:
             effect_text = f"Current: {max(5.0, 20.0 - (self.upgrade_data['current_level'] * 5.0))}s cooldown"
         elif self.upgrade_key == 'sprint_speed':
             effect_text = f"Current: {2.0 + (self.upgrade_data['current_level'] * 0.5)}x speed"
-        
-        effect_surface = pygame.font.Font(None, 24).render(effect_text, True, (0, 255, 0))
-        effect_rect = effect_surface.get_rect(topleft=(self.rect.x + 10, self.rect.y + 70))
-        screen.blit(effect_surface, effect_rect)
+        elif self.upgrade_key == 'magnet':
+            effect_text = f"Current: {self.upgrade_data['current_level'] * 40} pickup radius"
+        return effect_text
     
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
     
     def update_hover(self, pos):
-        self.hover = self.rect.collidepoint(pos)
-
-class ArcaneMage(Player):
-    def __init__(self, x, y):
-        super().__init__(x, y)
-        self.arrow_cooldown = 0.0
-        self.arrows = []  # List of active arrows (x, y, dx, dy)
-
-    def shoot_arrow(self, enemies):
-        if self.arrow_cooldown > 0 or not enemies:
-            return
-            
-        # Find nearest enemies up to arrow_count
-        nearest_enemies = []
-        for enemy in enemies:
-            dx = enemy.x - self.x
-            dy = enemy.y - self.y
-            dist = (dx * dx + dy * dy) ** 0.5
-            nearest_enemies.append((enemy, dist))
-        
-        nearest_enemies.sort(key=lambda x: x[1])  # Sort by distance
-        nearest_enemies = nearest_enemies[:self.arrow_count]  # Take only as many as we can shoot
-        
-        for enemy, _ in nearest_enemies:
-            dx = enemy.x - self.x
-            dy = enemy.y - self.y
-            dist = (dx * dx + dy * dy) ** 0.5
-            if dist > 0:
-                dx /= dist
-                dy /= dist
-            self.arrows.append((self.x, self.y, dx, dy))
-        
-            self.arrow_cooldown = ARROW_COOLDOWN
-
-    def update_arrow(self, dt, enemies):
-        if self.arrow_cooldown > 0:
-            self.arrow_cooldown -= dt
-            
-        # Update all arrows
-        for i in range(len(self.arrows) - 1, -1, -1):
-            x, y, dx, dy = self.arrows[i]
-            x += dx * 10  # Arrow speed
-            y += dy * 10
-            self.arrows[i] = (x, y, dx, dy)
-            
-        # Check collision with enemies
-            arrow_rect = pygame.Rect(x - 5, y - 5, 10, 10)
-            for enemy in enemies[:]:
-                if arrow_rect.colliderect(enemy.rect):
-                    enemies.remove(enemy)
-                    self.gain_experience(15)
-                    self.arrows.pop(i)
-                break
-
-    def draw_arrow(self, screen, offset_x, offset_y):
-        for x, y, _, _ in self.arrows:
-            screen_x = x - offset_x
-            screen_y = y - offset_y
-            pygame.draw.circle(screen, (255, 255, 255), (int(screen_x), int(screen_y)), 5)
+        # True if the hover state changed and the button needs redrawing
+        hover = self.rect.collidepoint(pos)
+        changed = hover != self.hover
+        self.hover = hover
+        return changed
 
 class Button:
     def __init__(self, rect, text, font, color=WHITE, bg=GRAY):
@@ -210,44 +153,106 @@ class AboutButton:
         return self.rect.collidepoint(pos)
     
     def update_hover(self, pos):
-        self.hover = self.rect.collidepoint(pos)
+        # True if the hover state changed and the button needs redrawing
+        hover = self.rect.collidepoint(pos)
+        changed = hover != self.hover
+        self.hover = hover
+        return changed
 
 class Game:
-    def __init__(self):
+    def __init__(self, sim_rate=SIM_RATE, render_fps=FPS, profile=False, profile_out=None, seed=None, record=None,
+                 pipelined=False, memory_out=None, render_scale=1.0, load=None):
+        # Simulation and render rates are independent, the sim always advances
+        # in fixed steps of 1 / sim_rate
+        self.sim_rate = sim_rate
+        self.sim_dt = 1.0 / sim_rate
+        self.render_fps = render_fps
+        self.accumulator = 0.0
+        # Initialize Pygame here rather than at import so the window shows up
+        # before anything else is loaded
+        pygame.init()
+        screen_info = pygame.display.Info()
+        self.screen_width = screen_info.current_w
+        self.screen_height = screen_info.current_h
+        self.lod_near_dist = math.hypot(self.screen_width, self.screen_height) / 2 + LOD_VIEW_MARGIN
+        # Images and fonts load on first use, scaled images are cached on disk
+        self.assets = AssetManager()
         # Initialize fullscreen display
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.FULLSCREEN)
         pygame.display.set_caption("Dark Messiah")
+        # Pipelined mode steps the simulation on a worker thread while the
+        # previous frame's snapshot is drawn, at the cost of a frame of latency
+        self.worker = SimulationWorker((self.screen_width, self.screen_height)) if pipelined else None
+        self.snapshot = None
+        self.pending_shots = 0
+        # When set, called with the simulation every tick for the Controls
+        # instead of reading the keyboard and mouse (stress runs)
+        self.autopilot = None
+        # The world is drawn onto world_surface at render_scale times the
+        # screen size and stretched up, 'auto' adjusts the scale to hold the
+        # frame rate (60 when uncapped)
+        self.auto_scale = AutoRenderScale(render_fps or 60) if render_scale == 'auto' else None
+        self.world_surface = None
+        self.set_render_scale(self.auto_scale.scale if self.auto_scale else render_scale)
         self.clock = pygame.time.Clock()
         self.running = True
         self.state = STATE_MENU
-        self.font = pygame.font.Font(None, 48)
-        self.small_font = pygame.font.Font(None, 36)
-        self.tiny_font = pygame.font.Font(None, 24)  # New font for about screen text
+        self.font = get_font(None, 48)
+        self.small_font = get_font(None, 36)
+        self.tiny_font = get_font(None, 24)  # New font for about screen text
+        # Fonts are built here on the main thread, FreeType is not safe to
+        # call from the loader threads
+        self.pixel_font = self.assets.font(PIXEL_FONT_PATH, 32)
+        # Decode and scale in the background while the menu is already usable
+        self.preloader = AssetPreloader()
+        self.queue_preloads()
+        # Frame phase timings, F3 toggles the overlay. Streaming to a file keeps
+        # the profiler running even while the overlay is hidden
+        self.profiler = FrameProfiler(enabled=profile, stream_path=profile_out)
+        self.show_profiler = profile
+        self.profiler_overlay = ProfilerOverlay(self.profiler, get_font(None, 22))
+        # Memory and entity counts sampled over the session, written to
+        # memory_out with a growth report on exit
+        self.memory_out = memory_out
+        self.telemetry = MemoryTelemetry() if memory_out else None
+        self.session_start = time.perf_counter()
+        # HUD labels only re-render when their value changes
+        self.level_label = TextLabel(self.small_font, "Level: {}", WHITE)
+        self.exp_label = TextLabel(self.small_font, "XP: {}/{}", WHITE)
+        self.health_label = TextLabel(self.small_font, "Health: {}", WHITE)
+        self.timer_label = TextLabel(self.pixel_font, "{:02d}:{:02d}", WHITE)
         self.selected_class = None
+        # Every run gets its seed from the game's RNG, so a fixed --seed makes
+        # the whole session reproducible
+        self.rng = random.Random(seed)
+        # Input of each run is written to record (numbered after the first run)
+        self.record_path = record
+        self.recorder = None
+        self.recorded_runs = 0
         # Base values for scaling
         self.base_enemy_spawn_time = 1.5
         self.base_enemy_speed = 2.0
         self.reset_game()
         # Adjust button positions for fullscreen
         self.menu_buttons = [
-            Button((SCREEN_WIDTH//2-100, SCREEN_HEIGHT//2+50, 200, 50), "Start", self.font),
-            Button((SCREEN_WIDTH//2-100, SCREEN_HEIGHT//2+120, 200, 50), "About", self.font)  # New about button
+            Button((self.screen_width//2-100, self.screen_height//2+50, 200, 50), "Start", self.font),
+            Button((self.screen_width//2-100, self.screen_height//2+120, 200, 50), "About", self.font)  # New about button
         ]
         self.game_over_buttons = [
-            Button((SCREEN_WIDTH//2-120, SCREEN_HEIGHT//2+40, 110, 50), "Details", self.small_font),
-            Button((SCREEN_WIDTH//2+10, SCREEN_HEIGHT//2+40, 110, 50), "Main Menu", self.small_font)
+            Button((self.screen_width//2-120, self.screen_height//2+40, 110, 50), "Details", self.small_font),
+            Button((self.screen_width//2+10, self.screen_height//2+40, 110, 50), "Main Menu", self.small_font)
         ]
         self.details_buttons = [
-            Button((SCREEN_WIDTH//2-100, SCREEN_HEIGHT-100, 200, 50), "Main Menu", self.font)
+            Button((self.screen_width//2-100, self.screen_height-100, 200, 50), "Main Menu", self.font)
         ]
         self.about_buttons = []
         # Adjust class selection screen for fullscreen
-        self.arcane_box = pygame.Rect(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 - 100, 200, 100)
+        self.arcane_box = pygame.Rect(self.screen_width//2 - 100, self.screen_height//2 - 100, 200, 100)
         self.arcane_label = self.small_font.render("Arcane Mage", True, WHITE)
-        self.arcane_label_rect = self.arcane_label.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
-        self.begin_venture_btn = Button((SCREEN_WIDTH - 200, SCREEN_HEIGHT - 100, 180, 50), "Begin venture", self.small_font, GREEN, (0, 100, 0))
+        self.arcane_label_rect = self.arcane_label.get_rect(center=(self.screen_width//2, self.screen_height//2 - 50))
+        self.begin_venture_btn = Button((self.screen_width - 200, self.screen_height - 100, 180, 50), "Begin venture", self.small_font, GREEN, (0, 100, 0))
         # Add exit button
-        self.exit_button = Button((SCREEN_WIDTH - 100, SCREEN_HEIGHT - 50, 80, 40), "Exit", self.small_font, RED, (100, 0, 0))
+        self.exit_button = Button((self.screen_width - 100, self.screen_height - 50, 80, 40), "Exit", self.small_font, RED, (100, 0, 0))
         self.upgrade_buttons = []
         self.level_up_title = None
         self.level_up_title_rect = None
@@ -326,6 +331,7 @@ class Game:
                     "- Sprint Duration: Longer sprint time",
                     "- Sprint Cooldown: Faster cooldown",
                     "- Sprint Speed: Faster sprint speed",
+                    "- Magnet: Pick up orbs from further away",
                     "",
                     "Upgrade Strategy:",
                     "- Choose based on playstyle",
@@ -339,7 +345,7 @@ class Game:
         button_width = 200
         button_height = 50
         button_spacing = 20
-        start_x = (SCREEN_WIDTH - (button_width * 2 + button_spacing)) // 2
+        start_x = (self.screen_width - (button_width * 2 + button_spacing)) // 2
         start_y = 150
         
         self.about_buttons = []
@@ -357,62 +363,115 @@ class Game:
             ))
         
         self.about_back_button = Button(
-            (SCREEN_WIDTH//2-100, SCREEN_HEIGHT-100, 200, 50),
+            (self.screen_width//2-100, self.screen_height-100, 200, 50),
             "Back to Menu",
             self.font
         )
         
+        back_width, back_height = self.small_font.size("← Back to Categories")
+        self.about_categories_button = AboutButton(
+            (10, 15, back_width + 20, back_height + 10),
+            "← Back to Categories",
+            self.small_font,
+            CYAN,
+            (30, 30, 30)
+        )
+        # Each section's text rendered once into a tall surface, scrolled as a viewport
+        self.about_pages = {}
+        self.about_view = pygame.Rect(0, 100, self.screen_width, self.screen_height - 250)
+        
         self.current_about_section = None
         self.about_scroll_offset = 0
         self.max_scroll = 0
+        
+        # Static screens are only repainted when something changes: a full
+        # redraw on clicks and state changes, just the affected buttons on hover
+        self.needs_redraw = True
+        self.drawn_state = None
+        self.dirty_widgets = []
+        if load:
+            # Straight into a saved run, skipping the menus
+            self.preloader.ensure_loaded()
+            self.load_run(load)
 
-    def reset_game(self):
-        if self.selected_class == "Arcane Mage":
-            self.player = ArcaneMage(0, 0)
-        else:
-            self.player = Player(0, 0)
+    def queue_preloads(self):
+        # Menu wallpaper first, then everything the game screen draws
+        width, height = self.screen_width, self.screen_height
+        self.preloader.submit('menu_bg', lambda: self.assets.cover_image(MENU_BG_PATH, width, height), PRIORITY_MENU)
+        for shape, radius, color in GAME_SPRITES:
+            self.preloader.submit(('sprite', shape, radius, color),
+                                  lambda shape=shape, radius=radius, color=color: ATLAS.get(shape, radius, color),
+                                  PRIORITY_GAME)
+
+    def reset_game(self, sim=None):
+        # A fresh run, or sim when continuing a loaded one
+        if sim is None:
+            sim = Simulation(self.selected_class, self.base_enemy_spawn_time, self.base_enemy_speed,
+                             seed=self.rng.getrandbits(32), lod_near_dist=self.lod_near_dist)
+        self.sim = sim
+        # The simulation's phase laps would interleave with the main thread's
+        # when it runs on the worker, so it is only profiled in serial mode
+        self.sim.profiler = NULL_PROFILER if self.worker else self.profiler
+        self.snapshot = None
+        self.pending_shots = 0
+        if self.auto_scale:
+            self.auto_scale.reset()
         self.camera_x = 0
         self.camera_y = 0
-        self.orbs = []
-        self.enemies = []
-        self.spawn_timer = 0.0
-        self.enemy_spawn_timer = 0.0
-        self.start_ticks = pygame.time.get_ticks()
-        self.xp_gained = 0
-        self.enemies_defeated = 0
-        self.level_reached = 1
-        self.game_time = 0
-        self.last_health_increase_level = 0
-        self.last_scaling_level = 0
-        self.venture_start_time = None  # Will be set when game starts
+        # Per-layer (drawn, culled) counts from the last rendered frame
+        self.cull_stats = {}
         self.upgrade_buttons = []
         self.level_up_title = None
         self.level_up_title_rect = None
 
-    def apply_level_scaling(self):
-        # Health increase every 5 levels
-        if self.player.level >= self.last_health_increase_level + 5:
-            self.player.health += 20
-            self.last_health_increase_level = self.player.level
+    def start_recording(self):
+        self.stop_recording()
+        if not self.record_path:
+            return
+        self.recorded_runs += 1
+        path = self.record_path
+        if self.recorded_runs > 1:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}-{self.recorded_runs}{ext}"
+        self.recorder = InputRecorder(path, self.sim, self.sim_rate)
 
-        # Enemy speed and spawn rate scaling every 5 levels
-        if self.player.level >= self.last_scaling_level + 5:
-            self.last_scaling_level = self.player.level
-            # Update enemy speed for all existing enemies
-            for enemy in self.enemies:
-                enemy.speed *= 1.5  # Increase speed by 50%
+    def save_run(self, path=QUICKSAVE_PATH):
+        size = save_state(self.sim, path)
+        print(f"Saved the run to {path} ({size} bytes)")
+
+    def load_run(self, path=QUICKSAVE_PATH):
+        # Recordings replay from a run's seed, so one can't go on past a load
+        self.stop_recording()
+        sim = load_state(path)
+        sim.lod_near_dist = self.lod_near_dist  # The reduced LOD bands start off this screen
+        self.selected_class = sim.selected_class
+        self.reset_game(sim)
+        self.accumulator = 0.0
+        self.needs_redraw = True
+        if sim.game_over:
+            self.state = STATE_GAME_OVER
+        elif sim.level_up_pending:
+            self.show_level_up_screen()
+        else:
+            self.state = STATE_RUNNING
+        print(f"Loaded the run from {path}")
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def show_level_up_screen(self):
         self.state = STATE_LEVEL_UP
-        available_upgrades = self.player.get_available_upgrades()
+        available_upgrades = self.sim.player.get_available_upgrades()
         
         # Create upgrade buttons
         self.upgrade_buttons = []
         button_width = 300
         button_height = 120  # Increased height to accommodate effect text
         padding = 20
-        start_x = (SCREEN_WIDTH - (button_width * 2 + padding)) // 2
-        start_y = (SCREEN_HEIGHT - (len(available_upgrades) // 2 + 1) * (button_height + padding)) // 2
+        start_x = (self.screen_width - (button_width * 2 + padding)) // 2
+        start_y = (self.screen_height - (len(available_upgrades) // 2 + 1) * (button_height + padding)) // 2
         
         for i, (key, data) in enumerate(available_upgrades.items()):
             row = i // 2
@@ -422,29 +481,63 @@ class Game:
             self.upgrade_buttons.append(UpgradeButton((x, y, button_width, button_height), key, data, self.font))
         
         # Create title and instruction
-        self.level_up_title = self.font.render(f"Level {self.player.level} Up!", True, (255, 255, 255))
-        self.level_up_instruction = pygame.font.Font(None, 36).render("Choose ONE upgrade:", True, (200, 200, 200))
-        self.level_up_title_rect = self.level_up_title.get_rect(center=(SCREEN_WIDTH // 2, start_y - 80))
-        self.level_up_instruction_rect = self.level_up_instruction.get_rect(center=(SCREEN_WIDTH // 2, start_y - 30))
+        self.level_up_title = self.font.render(f"Level {self.sim.player.level} Up!", True, (255, 255, 255))
+        self.level_up_instruction = render_text(self.small_font, "Choose ONE upgrade:", (200, 200, 200))
+        self.level_up_title_rect = self.level_up_title.get_rect(center=(self.screen_width // 2, start_y - 80))
+        self.level_up_instruction_rect = self.level_up_instruction.get_rect(center=(self.screen_width // 2, start_y - 30))
+
+    def about_page(self, key):
+        page = self.about_pages.get(key)
+        if page is None:
+            lines = [self.tiny_font.render(line, True, WHITE) for line in self.about_sections[key]['content']]
+            page = pygame.Surface((self.screen_width, len(lines) * 30), pygame.SRCALPHA)
+            for i, text in enumerate(lines):
+                page.blit(text, (self.screen_width//2 - text.get_width()//2, i * 30))
+            self.about_pages[key] = page
+        return page
+
+    def is_idle(self):
+        # Static screen already on display with nothing pending
+        return (self.state != STATE_RUNNING and self.state == self.drawn_state
+                and not self.needs_redraw and not self.dirty_widgets)
 
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        events = pygame.event.get() if events is None else events + pygame.event.get()
+        for event in events:
             if event.type == QUIT:
                 self.running = False
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED, ASSET_LOADED):
+                self.needs_redraw = True
             elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
+                if event.key == K_F3:
+                    self.toggle_profiler()
+                elif event.key == K_F5 and self.state in (STATE_RUNNING, STATE_LEVEL_UP):
+                    self.save_run()
+                elif event.key == K_F9 and self.state != STATE_ABOUT and os.path.exists(QUICKSAVE_PATH):
+                    self.load_run()
+                elif event.key == K_ESCAPE:
                     if self.state == STATE_RUNNING:
                         self.running = False
                     elif self.state in [STATE_MENU, STATE_CLASS_SELECT, STATE_GAME_OVER, STATE_DETAILS, STATE_LEVEL_UP, STATE_ABOUT]:
                         self.running = False
             elif event.type == MOUSEBUTTONDOWN:
+                if self.state != STATE_RUNNING:
+                    self.needs_redraw = True
                 if event.button == 1:  # Left click
-                    if self.state == STATE_RUNNING and isinstance(self.player, ArcaneMage):
-                        self.player.shoot_arrow(self.enemies)
+                    if self.state == STATE_RUNNING:
+                        if self.worker:
+                            # The worker owns the simulation, the shot goes out with the next job
+                            self.pending_shots += 1
+                        else:
+                            self.sim.shoot()
+                            if self.recorder:
+                                self.recorder.shoot()
                     elif self.state == STATE_LEVEL_UP:
                         for button in self.upgrade_buttons:
                             if button.is_clicked(event.pos):
-                                if self.player.apply_upgrade(button.upgrade_key):
+                                if self.sim.choose_upgrade(button.upgrade_key):
+                                    if self.recorder:
+                                        self.recorder.choose_upgrade(button.upgrade_key)
                                     self.state = STATE_RUNNING
                                     return
                     elif self.state == STATE_MENU:
@@ -458,8 +551,10 @@ class Game:
                         if self.arcane_box.collidepoint(event.pos):
                             self.selected_class = "Arcane Mage"
                         if self.begin_venture_btn.is_clicked(event.pos) and self.selected_class == "Arcane Mage":
+                            # Anything still loading is needed from the first frame on
+                            self.preloader.ensure_loaded()
                             self.reset_game()
-                            self.venture_start_time = time.time()  # Set start time when game begins
+                            self.start_recording()
                             self.state = STATE_RUNNING
                     elif self.state == STATE_GAME_OVER:
                         if self.game_over_buttons[0].is_clicked(event.pos):
@@ -474,14 +569,18 @@ class Game:
                             self.state = STATE_MENU
                             self.current_about_section = None
                             self.about_scroll_offset = 0
-                        elif not self.current_about_section:
+                        elif self.current_about_section:
+                            if self.about_categories_button.is_clicked(event.pos):
+                                self.current_about_section = None
+                                self.about_scroll_offset = 0
+                        else:
                             for button in self.about_buttons:
                                 if button.is_clicked(event.pos):
                                     self.current_about_section = button.text.lower()
                                     self.about_scroll_offset = 0
                                     # Calculate max scroll based on content length
                                     content = self.about_sections[self.current_about_section]['content']
-                                    self.max_scroll = max(0, len(content) * 30 - (SCREEN_HEIGHT - 400))
+                                    self.max_scroll = max(0, len(content) * 30 - (self.screen_height - 400))
                     # Check exit button in all states
                     if self.exit_button.is_clicked(event.pos):
                         self.running = False
@@ -491,157 +590,139 @@ class Game:
                     self.about_scroll_offset = min(self.max_scroll, self.about_scroll_offset + 30)
             elif event.type == MOUSEMOTION and self.state == STATE_LEVEL_UP:
                 # Update hover state for all upgrade buttons
-                for button in self.upgrade_buttons:
-                    button.update_hover(event.pos)
+                self.update_hover(self.upgrade_buttons, event.pos)
             elif event.type == MOUSEMOTION and self.state == STATE_ABOUT:
-                if not self.current_about_section:
-                    for button in self.about_buttons:
-                        button.update_hover(event.pos)
+                if self.current_about_section:
+                    self.update_hover([self.about_categories_button], event.pos)
+                else:
+                    self.update_hover(self.about_buttons, event.pos)
 
-    def update(self):
-        if self.state != STATE_RUNNING:
-            return
+    def update_hover(self, buttons, pos):
+        for button in buttons:
+            if button.update_hover(pos) and button not in self.dirty_widgets:
+                self.dirty_widgets.append(button)
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler or self.profiler.stream:
+            self.profiler.enable()
+        else:
+            self.profiler.disable()
+
+    def run_pipelined_frame(self, frame_time):
+        # Hand this frame's ticks to the worker, draw the snapshot the last
+        # job produced in the meantime, then pick up the new one
+        if self.snapshot is None:
+            self.snapshot = RenderSnapshot(self.sim, (self.screen_width, self.screen_height))
+        self.accumulator += frame_time
+        ticks = int(self.accumulator // self.sim_dt)
+        self.accumulator -= ticks * self.sim_dt
+        # Input is sampled once for all of the frame's ticks
+        controls = self.read_controls()
+        self.worker.submit(self.sim, ticks, self.sim_dt, controls, self.pending_shots, self.recorder,
+                           self.accumulator / self.sim_dt)
+        self.pending_shots = 0
+        self.draw()
+        self.snapshot = self.worker.collect()
+        self.profiler.lap('sim_wait')
+        if self.snapshot.game_over:
+            self.state = STATE_GAME_OVER
+            self.stop_recording()
+        elif self.snapshot.level_up_pending:
+            self.show_level_up_screen()
+
+    def read_controls(self):
+        if self.autopilot:
+            return self.autopilot(self.sim)
         keys = pygame.key.get_pressed()
         mouse_buttons = pygame.mouse.get_pressed()  # Get mouse button states
-        self.player.move(keys, mouse_buttons)
-        
-        # Apply level scaling
-        self.apply_level_scaling()
-        
-        dt = self.clock.get_time() / 1000.0
-        if isinstance(self.player, ArcaneMage):
-            self.player.update_arrow(dt, self.enemies)
-        self.camera_x = self.player.x - SCREEN_WIDTH // 2 + self.player.width // 2
-        self.camera_y = self.player.y - SCREEN_HEIGHT // 2 + self.player.height // 2
-        player_rect = pygame.Rect(self.player.x, self.player.y, self.player.width, self.player.height)
-        collected_orbs = []
-        for orb in self.orbs:
-            orb.update_rect()
-            if player_rect.colliderect(orb.rect):
-                self.player.gain_experience(orb.exp_value)
-                self.xp_gained += orb.exp_value
-                collected_orbs.append(orb)
-        for orb in collected_orbs:
-            self.orbs.remove(orb)
-        self.spawn_timer += dt
-        if self.spawn_timer >= 0.5:
-            orb_spawn_min = 500
-            orb_spawn_max = 800
-            jitter = 50
-            angle = random.uniform(0, 2 * math.pi)
-            dist = random.uniform(orb_spawn_min, orb_spawn_max)
-            orbx = self.player.x + dist * math.cos(angle) + random.randint(-jitter, jitter)
-            orby = self.player.y + dist * math.sin(angle) + random.randint(-jitter, jitter)
-            self.orbs.append(Orb(orbx, orby))
-            self.spawn_timer = 0.0
-
-        # Calculate current enemy spawn time based on level
-        current_spawn_time = self.base_enemy_spawn_time / (1.5 ** (self.player.level // 5))
-        self.enemy_spawn_timer += dt
-        if self.enemy_spawn_timer >= current_spawn_time:
-            enemy_spawn_min = 500
-            enemy_spawn_max = 800
-            jitter = 50
-            angle = random.uniform(0, 2 * math.pi)
-            dist = random.uniform(enemy_spawn_min, enemy_spawn_max)
-            enemyx = self.player.x + dist * math.cos(angle) + random.randint(-jitter, jitter)
-            enemyy = self.player.y + dist * math.sin(angle) + random.randint(-jitter, jitter)
-            # Calculate current enemy speed based on level
-            current_enemy_speed = self.base_enemy_speed * (1.5 ** (self.player.level // 5))
-            enemy = Enemy(enemyx, enemyy, speed=current_enemy_speed)
-            self.enemies.append(enemy)
-            self.enemy_spawn_timer = 0.0
-
-        for enemy in self.enemies:
-            enemy.update(self.player.x, self.player.y)
-        for i in range(len(self.enemies)):
-            for j in range(i + 1, len(self.enemies)):
-                self.enemies[i].separate(self.enemies[j])
-        hit_enemies = []
-        for enemy in self.enemies:
-            if player_rect.colliderect(enemy.rect):
-                self.player.health -= 10
-                self.enemies_defeated += 1
-                hit_enemies.append(enemy)
-        for enemy in hit_enemies:
-            self.enemies.remove(enemy)
-        self.level_reached = self.player.level
-        self.game_time = (pygame.time.get_ticks() - self.start_ticks) // 1000
-        if self.player.health <= 0:
-            self.state = STATE_GAME_OVER
+        return Controls.from_pygame(keys, mouse_buttons)
 
-        # Check for level up
-        if self.player.experience >= self.player.experience_to_level:
-            self.player.level_up()
-            self.show_level_up_screen()
+    def update(self, dt):
+        # One fixed simulation tick of dt seconds
+        if self.state != STATE_RUNNING:
             return
+        controls = self.read_controls()
+        if self.recorder:
+            self.recorder.tick(controls)
+        self.sim.step(dt, controls)
+        if self.sim.game_over:
+            self.state = STATE_GAME_OVER
+            self.stop_recording()
+        elif self.sim.level_up_pending:
+            # Check for level up
+            self.show_level_up_screen()
+
+    def update_camera(self, player, alpha):
+        # Centre on the player, blended between the last two ticks
+        x = player.prev_x + (player.x - player.prev_x) * alpha
+        y = player.prev_y + (player.y - player.prev_y) * alpha
+        self.camera_x = x - self.screen_width // 2 + player.width // 2
+        self.camera_y = y - self.screen_height // 2 + player.height // 2
 
-    def draw(self):
+    def draw(self, alpha=1.0):
+        # alpha is how far the render time is between the previous and the
+        # current simulation tick
+        if self.state != STATE_RUNNING and self.state == self.drawn_state and not self.needs_redraw:
+            self.draw_dirty_widgets()
+            return
         if self.state == STATE_MENU:
-            if MENU_BG:
-                self.screen.blit(MENU_BG, (0, 0))
+            menu_bg = self.preloader.get('menu_bg')
+            if menu_bg:
+                self.screen.blit(menu_bg, (0, 0))
             else:
                 self.screen.fill(BLACK)
-            title = self.font.render("Dark Messiah", True, WHITE)
-            self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, SCREEN_HEIGHT//2 - 100))
+            title = render_text(self.font, "Dark Messiah", WHITE)
+            self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, self.screen_height//2 - 100))
             for btn in self.menu_buttons:
                 btn.draw(self.screen)
             self.exit_button.draw(self.screen)
+            self.draw_loading_progress()
         elif self.state == STATE_CLASS_SELECT:
             self.screen.fill(BLACK)
             pygame.draw.rect(self.screen, (GRAY if self.selected_class != "Arcane Mage" else GREEN), self.arcane_box, 2)
             self.screen.blit(self.arcane_label, self.arcane_label_rect)
             self.begin_venture_btn.draw(self.screen)
             self.exit_button.draw(self.screen)
+            self.draw_loading_progress()
         elif self.state == STATE_RUNNING:
-            self.screen.fill(BLACK)
-            for orb in self.orbs:
-                orb.draw(self.screen, self.camera_x, self.camera_y)
-            for enemy in self.enemies:
-                enemy.draw(self.screen, self.camera_x, self.camera_y)
-            self.player.draw(self.screen)
-            if isinstance(self.player, ArcaneMage):
-                self.player.draw_arrow(self.screen, self.camera_x, self.camera_y)
-            
-            # Draw HUD
-            font = pygame.font.Font(None, 36)
-            level_text = font.render(f"Level: {self.player.level}", True, WHITE)
-            exp_text = font.render(f"XP: {self.player.experience}/{self.player.experience_to_level}", True, WHITE)
-            health_text = font.render(f"Health: {self.player.health}", True, WHITE)
-            self.screen.blit(level_text, (10, 10))
-            self.screen.blit(exp_text, (10, 50))
-            self.screen.blit(health_text, (10, 90))
-            
-            # Draw pixelated timer
-            if self.venture_start_time is not None:
-                elapsed_time = int(time.time() - self.venture_start_time)
-                minutes = elapsed_time // 60
-                seconds = elapsed_time % 60
-                timer_text = PIXEL_FONT.render(f"{minutes:02d}:{seconds:02d}", True, WHITE)
-                timer_rect = timer_text.get_rect(topright=(SCREEN_WIDTH - 20, 20))
-                self.screen.blit(timer_text, timer_rect)
-            
-            self.exit_button.draw(self.screen)
+            target = self.world_surface or self.screen
+            target.fill(BLACK)
+            if self.worker:
+                frame = self.snapshot
+                self.draw_snapshot(target, frame)
+                player, elapsed = frame.player, frame.elapsed
+            else:
+                self.draw_world(target, alpha)
+                player, elapsed = self.sim.player, self.sim.elapsed
+            if self.world_surface:
+                # One stretch to native size, then the player (always at the
+                # centre) stays sharp on top
+                pygame.transform.scale(self.world_surface, self.screen.get_size(), self.screen)
+                player.draw(self.screen)
+            self.profiler.lap('draw_world')
+            self.draw_hud(player, elapsed)
+            self.profiler.lap('draw_hud')
         elif self.state == STATE_GAME_OVER:
             self.screen.fill(BLACK)
-            over = self.font.render("You Died!", True, RED)
-            self.screen.blit(over, (SCREEN_WIDTH//2 - over.get_width()//2, SCREEN_HEIGHT//2 - 100))
+            over = render_text(self.font, "You Died!", RED)
+            self.screen.blit(over, (self.screen_width//2 - over.get_width()//2, self.screen_height//2 - 100))
             for btn in self.game_over_buttons:
                 btn.draw(self.screen)
             self.exit_button.draw(self.screen)
         elif self.state == STATE_DETAILS:
             self.screen.fill(BLACK)
-            details_title = self.font.render("Run Details", True, WHITE)
-            self.screen.blit(details_title, (SCREEN_WIDTH//2 - details_title.get_width()//2, 60))
+            details_title = render_text(self.font, "Run Details", WHITE)
+            self.screen.blit(details_title, (self.screen_width//2 - details_title.get_width()//2, 60))
             stats = [
-                f"Time Survived: {self.game_time} seconds",
-                f"XP Gained: {self.xp_gained}",
-                f"Level Reached: {self.level_reached}",
-                f"Enemies Defeated: {self.enemies_defeated}"
+                f"Time Survived: {self.sim.game_time} seconds",
+                f"XP Gained: {self.sim.experience_earned()}",
+                f"Level Reached: {self.sim.level_reached}",
+                f"Enemies Defeated: {self.sim.enemies_defeated}"
             ]
             for i, stat in enumerate(stats):
-                stat_text = self.small_font.render(stat, True, WHITE)
-                self.screen.blit(stat_text, (SCREEN_WIDTH//2 - stat_text.get_width()//2, 150 + i*50))
+                stat_text = render_text(self.small_font, stat, WHITE)
+                self.screen.blit(stat_text, (self.screen_width//2 - stat_text.get_width()//2, 150 + i*50))
             for btn in self.details_buttons:
                 btn.draw(self.screen)
             self.exit_button.draw(self.screen)
@@ -660,59 +741,339 @@ class Game:
             
             if not self.current_about_section:
                 # Draw main about screen with section buttons
-                title = self.font.render("How to Play", True, WHITE)
-                self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 60))
+                title = render_text(self.font, "How to Play", WHITE)
+                self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 60))
                 
-                subtitle = self.small_font.render("Select a category to learn more:", True, CYAN)
-                self.screen.blit(subtitle, (SCREEN_WIDTH//2 - subtitle.get_width()//2, 100))
+                subtitle = render_text(self.small_font, "Select a category to learn more:", CYAN)
+                self.screen.blit(subtitle, (self.screen_width//2 - subtitle.get_width()//2, 100))
                 
                 for button in self.about_buttons:
                     button.draw(self.screen)
             else:
                 # Draw selected section content
                 section = self.about_sections[self.current_about_section]
-                title = self.font.render(section['title'], True, section['color'])
-                self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 60))
+                title = render_text(self.font, section['title'], section['color'])
+                self.screen.blit(title, (self.screen_width//2 - title.get_width()//2, 60))
                 
-                # Draw content with scrolling
-                y_offset = 150 - self.about_scroll_offset
-                for line in section['content']:
-                    if y_offset > 100 and y_offset < SCREEN_HEIGHT - 150:  # Only draw visible text
-                        text = self.tiny_font.render(line, True, WHITE)
-                        self.screen.blit(text, (SCREEN_WIDTH//2 - text.get_width()//2, y_offset))
-                    y_offset += 30
+                # Draw content with scrolling, only the part inside the viewport
+                self.screen.set_clip(self.about_view)
+                self.screen.blit(self.about_page(self.current_about_section), (0, 150 - self.about_scroll_offset))
+                self.screen.set_clip(None)
                 
                 # Draw scroll indicator if content is scrollable
                 if self.max_scroll > 0:
-                    scroll_height = (SCREEN_HEIGHT - 300) * (SCREEN_HEIGHT - 300) / (len(section['content']) * 30)
-                    scroll_y = 150 + (SCREEN_HEIGHT - 300 - scroll_height) * (self.about_scroll_offset / self.max_scroll)
-                    pygame.draw.rect(self.screen, GRAY, (SCREEN_WIDTH - 20, scroll_y, 10, scroll_height))
-            
-            # Draw back button
-            if self.current_about_section:
-                back_text = self.small_font.render("← Back to Categories", True, CYAN)
-                back_rect = back_text.get_rect(topleft=(20, 20))
-                pygame.draw.rect(self.screen, (30, 30, 30), back_rect.inflate(20, 10))
-                self.screen.blit(back_text, back_rect)
-                if back_rect.collidepoint(pygame.mouse.get_pos()):
-                    pygame.draw.rect(self.screen, (50, 50, 50), back_rect.inflate(20, 10))
-                if pygame.mouse.get_pressed()[0] and back_rect.collidepoint(pygame.mouse.get_pos()):
-                    self.current_about_section = None
-                    self.about_scroll_offset = 0
+                    scroll_height = (self.screen_height - 300) * (self.screen_height - 300) / (len(section['content']) * 30)
+                    scroll_y = 150 + (self.screen_height - 300 - scroll_height) * (self.about_scroll_offset / self.max_scroll)
+                    pygame.draw.rect(self.screen, GRAY, (self.screen_width - 20, scroll_y, 10, scroll_height))
+                
+                # Draw back button
+                self.about_categories_button.draw(self.screen)
             
             self.about_back_button.draw(self.screen)
             self.exit_button.draw(self.screen)
+        self.profiler.lap('draw')
         pygame.display.flip()
+        self.profiler.lap('flip')
+        self.needs_redraw = False
+        self.drawn_state = self.state
+        self.dirty_widgets = []
+
+    def set_render_scale(self, scale):
+        self.render_scale = scale
+        if scale < 1.0:
+            size = (max(1, int(self.screen_width * scale)), max(1, int(self.screen_height * scale)))
+            self.world_surface = pygame.Surface(size).convert()
+        else:
+            self.world_surface = None
+
+    def draw_world(self, target, alpha):
+        # target is the screen, or world_surface at render_scale; the player
+        # is left to draw() when scaled
+        scale = self.render_scale
+        self.update_camera(self.sim.player, alpha)
+        # Cull to what the camera sees, then one batched blit pass per layer
+        view = pygame.Rect(int(self.camera_x), int(self.camera_y), self.screen_width, self.screen_height)
+        orbs = self.sim.orbs.visible(view)
+        enemies = self.sim.enemies.visible(view)
+        draw_orbs(target, orbs, self.camera_x, self.camera_y, scale)
+        self.sim.enemies.draw(target, self.camera_x, self.camera_y, enemies, alpha, scale)
+        if target is self.screen:
+            self.sim.player.draw(target)
+        self.cull_stats['orbs'] = (len(orbs), len(self.sim.orbs) - len(orbs))
+        self.cull_stats['enemies'] = (len(enemies), len(self.sim.enemies) - len(enemies))
+        if isinstance(self.sim.player, ArcaneMage):
+            arrows = self.sim.player.arrows.visible(view)
+            self.sim.player.draw_arrow(target, self.camera_x, self.camera_y, arrows, alpha, scale)
+            self.cull_stats['arrows'] = (len(arrows), len(self.sim.player.arrows) - len(arrows))
+
+    def draw_snapshot(self, target, frame):
+        # The same layers as draw_world, read from a RenderSnapshot
+        scale = self.render_scale
+        alpha = frame.alpha
+        self.update_camera(frame.player, alpha)
+        view = pygame.Rect(int(self.camera_x), int(self.camera_y), self.screen_width, self.screen_height)
+        orbs = frame.orbs.visible(view)
+        enemies = frame.enemies.visible(view)
+        frame.orbs.draw(target, self.camera_x, self.camera_y, orbs, 1.0, scale)
+        frame.enemies.draw(target, self.camera_x, self.camera_y, enemies, alpha, scale)
+        if target is self.screen:
+            frame.player.draw(target)
+        self.cull_stats['orbs'] = (len(orbs), frame.orb_count - len(orbs))
+        self.cull_stats['enemies'] = (len(enemies), frame.enemy_count - len(enemies))
+        if frame.arrows is not None:
+            arrows = frame.arrows.visible(view)
+            frame.arrows.draw(target, self.camera_x, self.camera_y, arrows, alpha, scale)
+            self.cull_stats['arrows'] = (len(arrows), frame.arrow_count - len(arrows))
+
+    def draw_hud(self, player, elapsed):
+        self.level_label.draw(self.screen, player.level, topleft=(10, 10))
+        self.exp_label.draw(self.screen, player.experience, player.experience_to_level, topleft=(10, 50))
+        self.health_label.draw(self.screen, player.health, topleft=(10, 90))
+        
+        # Draw pixelated timer, driven by simulation time so it stays in step with the game
+        elapsed_time = int(elapsed)
+        minutes = elapsed_time // 60
+        seconds = elapsed_time % 60
+        self.timer_label.draw(self.screen, minutes, seconds, topright=(self.screen_width - 20, 20))
+        
+        self.exit_button.draw(self.screen)
+        if self.show_profiler:
+            self.profiler_overlay.draw(self.screen, 10, 140)
+
+    def draw_loading_progress(self):
+        # Small bar in the bottom left while background loading is going on
+        done, total = self.preloader.progress()
+        if done >= total:
+            return
+        x, y = 20, self.screen_height - 40
+        pygame.draw.rect(self.screen, GRAY, (x, y, 200, 10), 1)
+        pygame.draw.rect(self.screen, CYAN, (x, y, 200 * done // total, 10))
+        label = render_text(self.tiny_font, f"Loading assets {done}/{total}", GRAY)
+        self.screen.blit(label, (x, y - 25))
+
+    def draw_dirty_widgets(self):
+        # Buttons paint their whole rect, so only those rects need pushing
+        if not self.dirty_widgets:
+            return
+        for widget in self.dirty_widgets:
+            widget.draw(self.screen)
+        self.profiler.lap('draw')
+        pygame.display.update([widget.rect for widget in self.dirty_widgets])
+        self.profiler.lap('flip')
+        self.dirty_widgets = []
+
+    def arrow_count(self):
+        player = self.sim.player
+        return len(player.arrows) if isinstance(player, ArcaneMage) else 0
+
+    def sample_memory(self):
+        sim = self.sim
+        self.telemetry.maybe_sample(time.perf_counter() - self.session_start, enemies=len(sim.enemies),
+                                    orbs=len(sim.orbs), arrows=self.arrow_count(),
+                                    orbs_evicted=sim.evicted['orbs'], arrows_evicted=sim.evicted['arrows'])
+
+    def write_memory_report(self):
+        self.telemetry.write_csv(self.memory_out)
+        for line in self.telemetry.report():
+            print(line)
+        self.telemetry.close()
+
+    def drawn_count(self):
+        # Entities that survived culling in the last running frame
+        return sum(drawn for drawn, _ in self.cull_stats.values())
+
+    def step_frame(self, frame_time, events=None, before_tick=None):
+        # One frame of the main loop: events, the simulation ticks frame_time
+        # pays for, drawing, then profiling, telemetry and the render scale.
+        # before_tick runs between the events and the ticks, stress mode
+        # drives its bot from there
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.handle_events(events)
+        profiler.lap('events')
+        if before_tick:
+            before_tick()
+        if self.state == STATE_RUNNING and self.worker:
+            self.run_pipelined_frame(frame_time)
+        else:
+            if self.state == STATE_RUNNING:
+                self.accumulator += frame_time
+                while self.accumulator >= self.sim_dt and self.state == STATE_RUNNING:
+                    self.update(self.sim_dt)
+                    self.accumulator -= self.sim_dt
+            else:
+                self.accumulator = 0.0
+            self.draw(self.accumulator / self.sim_dt)
+        if profiler.enabled:
+            profiler.end_frame(enemies=len(self.sim.enemies), orbs=len(self.sim.orbs),
+                               arrows=self.arrow_count(), drawn=self.drawn_count())
+        if self.telemetry:
+            self.sample_memory()
+        if self.auto_scale and self.state == STATE_RUNNING:
+            scale = self.auto_scale.update(self.clock.get_rawtime())
+            if scale != self.render_scale:
+                self.set_render_scale(scale)
 
     def run(self):
+        # Fixed timestep: real time accumulates and is consumed in whole
+        # simulation ticks, rendering interpolates the leftover fraction
         while self.running:
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
-        pygame.quit()
+            if self.is_idle():
+                # Nothing on screen can change without input, sleep until some arrives
+                events = [pygame.event.wait()]
+                self.clock.tick()  # Restart frame timing so the wait isn't fed to the simulation
+                frame_time = 0.0
+            else:
+                events = None
+                frame_time = min(self.clock.tick(self.render_fps) / 1000.0, MAX_FRAME_TIME)
+            self.step_frame(frame_time, events)
+        self.close()
         sys.exit()
 
+    def run_stress(self, duration, policy='stand', strategy='offense', spawn_time=None, enemies=0, budgets=None,
+                   waves=()):
+        # Play a run with a bot for duration seconds of wall time through the
+        # normal update and draw path, then print frame time percentiles, tick
+        # counts and peak entity counts. The player can't die. spawn_time
+        # pins the enemy spawn interval, enemies keeps the horde topped up
+        # to that many, waves are (count, period) pairs spawned on top of the
+        # usual trickle. Returns 1 if a budget (see stress.py) was broken or
+        # the run ended before duration other than by ESC
+        rng = random.Random(0)
+        memory = {}
+        move = POLICIES[policy]
+        self.autopilot = lambda sim: move(sim, rng, memory)
+        self.preloader.ensure_loaded()
+        if self.state not in (STATE_RUNNING, STATE_LEVEL_UP):  # Not already in a --load'ed run
+            self.selected_class = "Arcane Mage"
+            self.reset_game()
+            self.state = STATE_RUNNING
+        sim = self.sim
+        sim.invulnerable = True
+        sim.forced_spawn_time = spawn_time
+        for count, period in waves:
+            sim.spawner.add_wave(count, period)
+
+        def drive():
+            # Before each frame's ticks: pick upgrades, top up the horde and
+            # keep firing, the arrow cooldown does the gating
+            if self.state == STATE_LEVEL_UP:
+                available = sim.player.get_available_upgrades()
+                if available:
+                    sim.choose_upgrade(pick_upgrade(strategy, available, rng))
+                sim.level_up_pending = False
+                self.state = STATE_RUNNING
+            if self.state != STATE_RUNNING:
+                return
+            missing = enemies - len(sim.enemies) - sim.spawner.pending
+            if missing > 0:
+                sim.spawner.burst(missing)
+            if self.worker:
+                self.pending_shots += 1
+            else:
+                sim.shoot()
+
+        frame_ms = []
+        work_ms = []
+        peaks = {'enemies': 0, 'orbs': 0, 'arrows': 0}
+        start_ticks = sim.ticks
+        lost_time = 0.0  # Frame time beyond MAX_FRAME_TIME, never simulated
+        self.clock.tick()
+        start = last = time.perf_counter()
+        while self.running and last - start < duration:
+            frame_time = self.clock.tick(self.render_fps) / 1000.0
+            lost_time += max(0.0, frame_time - MAX_FRAME_TIME)
+            frame_time = min(frame_time, MAX_FRAME_TIME)
+            # Timed here rather than by the clock, which only has whole milliseconds
+            now = time.perf_counter()
+            frame_ms.append((now - last) * 1000.0)
+            last = now
+            self.step_frame(frame_time, before_tick=drive)
+            if self.state not in (STATE_RUNNING, STATE_LEVEL_UP) or self.sim is not sim:
+                break
+            peaks['enemies'] = max(peaks['enemies'], len(sim.enemies))
+            peaks['orbs'] = max(peaks['orbs'], len(sim.orbs))
+            peaks['arrows'] = max(peaks['arrows'], self.arrow_count())
+            work_ms.append((time.perf_counter() - now) * 1000.0)
+        elapsed = time.perf_counter() - start
+        finished = last - start >= duration
+        self.autopilot = None
+
+        frame = frame_stats(frame_ms)
+        if frame is None:
+            print("stress: no frames ran")
+            return 1
+        for line in report(elapsed, frame, frame_stats(work_ms), sim.ticks - start_ticks,
+                           int(lost_time / self.sim_dt), peaks):
+            print(line)
+        failures = check_budgets(frame, budgets or {})
+        for failure in failures:
+            print("BUDGET EXCEEDED: " + failure)
+        if not finished and self.running:
+            # Only ESC (or closing the window) may end a run early, anything
+            # else means the numbers don't cover the load that was asked for
+            if self.sim is not sim:
+                reason = "another run was loaded"
+            elif sim.game_over:
+                reason = "the player died"
+            else:
+                reason = f"the game left the run for {self.state}"
+            print(f"RUN CUT SHORT: ended after {elapsed:.1f}s of {duration:g}s, {reason}")
+            return 1
+        return 1 if failures else 0
+
+    def close(self):
+        self.stop_recording()
+        if self.telemetry:
+            self.write_memory_report()
+        if self.worker:
+            self.worker.close()
+        self.preloader.shutdown()
+        self.profiler.close()
+        # The module caches hold fonts and surfaces of this pygame session
+        clear_text_cache()
+        ATLAS.clear()
+        pygame.quit()
+
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Dark Messiah")
+    parser.add_argument('--sim-rate', type=int, default=SIM_RATE, help="simulation ticks per second")
+    parser.add_argument('--fps', type=int, default=FPS, help="render frame cap, 0 for uncapped")
+    parser.add_argument('--profile', action='store_true', help="start with the profiler overlay shown (F3 toggles)")
+    parser.add_argument('--profile-out', help="stream per-frame phase timings to a .csv or .jsonl file")
+    parser.add_argument('--seed', type=int, help="seed for the game's RNG, fixes every run's spawns")
+    parser.add_argument('--record', help="record each run's input for replay.py (later runs get -2, -3, ...)")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="step the simulation on a worker thread while the previous frame is drawn")
+    parser.add_argument('--memory-out', help="sample memory (tracemalloc) and entity counts to a .csv, "
+                                             "report growth on exit")
+    parser.add_argument('--render-scale', type=parse_render_scale, default=1.0,
+                        help="draw the world at this fraction of the screen resolution (e.g. 0.5) and stretch it, "
+                             "or 'auto' to pick one that holds the frame rate; the HUD stays at full resolution")
+    parser.add_argument('--load', help="start straight into a run saved with F5 or savestate.py")
+    stress = parser.add_argument_group("stress test", "play a bot run for a fixed time and report frame times, "
+                                       "exits 1 if a budget is exceeded")
+    stress.add_argument('--stress', type=float, metavar='SECONDS', help="run the stress test for this long")
+    stress.add_argument('--policy', choices=POLICIES, default='stand', help="how the bot moves (stand = idle)")
+    stress.add_argument('--strategy', choices=STRATEGIES, default='offense', help="how the bot picks upgrades")
+    stress.add_argument('--spawn-time', type=float, help="pin the enemy spawn interval in seconds, level scaling no longer shortens it")
+    stress.add_argument('--enemies', type=int, default=0, help="keep at least this many enemies alive")
+    stress.add_argument('--wave', type=parse_wave, action='append', default=[], metavar='COUNT:PERIOD',
+                        help="spawn COUNT enemies at once every PERIOD seconds, repeatable")
+    stress.add_argument('--headless', action='store_true', help="use SDL's dummy video driver, no window")
+    for name in BUDGETS:
+        stress.add_argument('--' + name.replace('_', '-'), type=float,
+                            help="frames per second floor" if name == 'min_fps' else "frame time ceiling in ms")
+    args = parser.parse_args()
+    if args.headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    game = Game(sim_rate=args.sim_rate, render_fps=args.fps, profile=args.profile, profile_out=args.profile_out,
+                seed=args.seed, record=args.record, pipelined=args.pipelined,
+                memory_out=args.memory_out, render_scale=args.render_scale,
+                load=args.load)
+    if args.stress:
+        status = game.run_stress(args.stress, args.policy, args.strategy, args.spawn_time, args.enemies,
+                                 {name: getattr(args, name) for name in BUDGETS}, args.wave)
+        game.close()
+        sys.exit(status)
     game.run() 
@@ -1,20 +1,160 @@
-import pygame
-
-class Orb:
-    def __init__(self, x, y, radius=10, color=(0, 128, 255), exp_value=10):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.color = color
-        self.exp_value = exp_value
-        self.rect = pygame.Rect(x - radius, y - radius, radius * 2, radius * 2)
-
-    def draw(self, screen, offset_x, offset_y):
-        # Draw orb at its world position offset by the camera
-        screen_x = self.x - offset_x
-        screen_y = self.y - offset_y
-        pygame.draw.circle(screen, self.color, (int(screen_x), int(screen_y)), self.radius)
-
-    def update_rect(self):
-        self.rect.x = self.x - self.radius
-        self.rect.y = self.y - self.radius 
\ No newline at end of file
+import numpy as np
+import pygame
+from sprites import blit_groups
+from spatial_grid import SpatialGrid
+from entities import EntityStore
+
+ORB_GRID_CELL = 64
+ORB_BASE_RADIUS = 10
+ORB_BASE_EXP = 10
+ORB_MAX_RADIUS = 16  # Merged orbs grow up to this size
+
+class Orb:
+    # Compact record, no __dict__ and no stored Rect
+    __slots__ = ('x', 'y', 'radius', 'color', 'exp_value', 'born', 'handle')
+
+    def __init__(self, x, y, radius=10, color=(0, 128, 255), exp_value=10, born=0.0):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.color = color
+        self.exp_value = exp_value
+        self.born = born  # Simulation time it spawned at, for lifetime budgets
+        self.handle = None  # Set by the EntityStore holding the orb
+
+    @property
+    def rect(self):
+        return pygame.Rect(self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2)
+
+    def draw(self, screen, offset_x, offset_y):
+        # Draw orb at its world position offset by the camera
+        screen_x = self.x - offset_x
+        screen_y = self.y - offset_y
+        pygame.draw.circle(screen, self.color, (int(screen_x), int(screen_y)), self.radius)
+
+
+def draw_orbs(screen, orbs, offset_x, offset_y, scale=1.0):
+    # All orbs as batched blits of cached circle sprites
+    if not orbs:
+        return
+    xs = np.fromiter((orb.x for orb in orbs), dtype=np.float64, count=len(orbs))
+    ys = np.fromiter((orb.y for orb in orbs), dtype=np.float64, count=len(orbs))
+    radii = [orb.radius for orb in orbs]
+    colors = [orb.color for orb in orbs]
+    blit_groups(screen, 'circle', xs - offset_x, ys - offset_y, radii, colors, scale)
+
+
+class OrbField:
+    # Orbs never move, so they sit in a spatial grid that is only written on
+    # spawn and pickup. Pickup becomes a radius query around the player
+    def __init__(self, merge_radius=None, cell_size=ORB_GRID_CELL):
+        # With merge_radius set, a new orb spawning near an existing one is
+        # folded into it instead, keeping the orb count bounded on long runs
+        self.merge_radius = merge_radius
+        self.store = EntityStore()
+        self.grid = SpatialGrid(cell_size)
+
+    def spawn(self, x, y, exp_value=ORB_BASE_EXP, born=0.0):
+        if self.merge_radius:
+            target = self.nearest_within(x, y, self.merge_radius)
+            if target is not None:
+                self.merge(target, exp_value)
+                return target
+        orb = Orb(x, y, exp_value=exp_value, born=born)
+        self.add(orb)
+        return orb
+
+    def add(self, orb):
+        self.store.add(orb)
+        self.grid.insert(orb, orb.x, orb.y)
+        return orb.handle
+
+    def get(self, handle):
+        # The orb behind handle, or None once it has been picked up
+        return self.store.get(handle)
+
+    def remove(self, orb):
+        if self.store.remove(orb):
+            self.grid.remove(orb, orb.x, orb.y)
+
+    def merge(self, orb, exp_value):
+        # Higher value orbs are drawn a little bigger
+        orb.exp_value += exp_value
+        orb.radius = min(ORB_MAX_RADIUS, int(ORB_BASE_RADIUS * (orb.exp_value / ORB_BASE_EXP) ** 0.25))
+
+    def nearest_within(self, x, y, radius, exclude=None):
+        best = None
+        best_dist = radius * radius
+        for orb in self.grid.query(x, y, radius):
+            if orb is exclude:
+                continue
+            dist = (orb.x - x) ** 2 + (orb.y - y) ** 2
+            if dist <= best_dist:
+                best = orb
+                best_dist = dist
+        return best
+
+    def collect(self, rect, magnet_radius=0):
+        # Remove and return every orb touching rect, or with its edge within
+        # magnet_radius of the rect centre
+        left, top, right, bottom = rect.left, rect.top, rect.right, rect.bottom
+        cx = rect.x + rect.width / 2
+        cy = rect.y + rect.height / 2
+        reach = max(rect.width, rect.height) / 2 + magnet_radius + ORB_MAX_RADIUS
+        collected = []
+        for orb in self.grid.query(cx, cy, reach):
+            # Same overlap test as Rect.colliderect with the orb's bounding box
+            r = orb.radius
+            if orb.x - r < right and orb.x + r > left and orb.y - r < bottom and orb.y + r > top:
+                collected.append(orb)
+            elif magnet_radius > 0:
+                pull = magnet_radius + orb.radius
+                if (orb.x - cx) ** 2 + (orb.y - cy) ** 2 <= pull * pull:
+                    collected.append(orb)
+        for orb in collected:
+            self.remove(orb)
+        return collected
+
+    def enforce(self, budget, cx, cy, now):
+        # Drop orbs past the budget's age at time now or its range from
+        # (cx, cy), then evict the oldest or farthest of what is left over its
+        # count. The merge policy folds the oldest into their nearest
+        # neighbour instead, so the XP stays on the map, and only drops an orb
+        # with nobody within budget.merge_radius. Returns how many orbs went
+        evicted = [orb for orb in self.store
+                   if (budget.max_age is not None and now - orb.born > budget.max_age)
+                   or (budget.max_range is not None
+                       and (orb.x - cx) ** 2 + (orb.y - cy) ** 2 > budget.max_range * budget.max_range)]
+        for orb in evicted:
+            self.remove(orb)
+        excess = 0 if budget.max_count is None else len(self) - budget.max_count
+        if excess > 0:
+            if budget.policy == 'farthest':
+                order = sorted(self.store, key=lambda orb: (orb.x - cx) ** 2 + (orb.y - cy) ** 2, reverse=True)
+            else:
+                order = sorted(self.store, key=lambda orb: orb.born)
+            for orb in order[:excess]:
+                if budget.policy == 'merge':
+                    target = self.nearest_within(orb.x, orb.y, budget.merge_radius, exclude=orb)
+                    if target is not None:
+                        self.merge(target, orb.exp_value)
+                self.remove(orb)
+            evicted += order[:excess]
+        return len(evicted)
+
+    def visible(self, view):
+        # Orbs overlapping the view rect
+        left, top, right, bottom = view.left, view.top, view.right, view.bottom
+        return [orb for orb in self.grid.query_rect(view, ORB_MAX_RADIUS)
+                if orb.x + orb.radius >= left and orb.x - orb.radius < right
+                and orb.y + orb.radius >= top and orb.y - orb.radius < bottom]
+
+    def clear(self):
+        self.store.clear()
+        self.grid.clear()
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
@@ -0,0 +1,140 @@
+import copy
+import queue
+import threading
+import numpy as np
+import pygame
+from player import ArcaneMage
+from sprites import blit_groups
+
+# World pixels captured around the screen in every snapshot, covers the
+# camera moving between the snapshot's two ticks
+SNAPSHOT_MARGIN = 64
+
+
+class SpriteFrame:
+    # One layer's entities near the camera at a tick: positions at the start
+    # and end of the tick, radii and colors. Arrays are copies, the
+    # simulation can move on while a frame is drawn
+    def __init__(self, shape, x, y, px, py, radius, color):
+        self.shape = shape
+        self.x = x
+        self.y = y
+        self.px = px
+        self.py = py
+        self.radius = radius
+        self.color = color
+
+    def visible(self, view):
+        r = self.radius
+        inside = ((self.x + r >= view.left) & (self.x - r < view.right)
+                  & (self.y + r >= view.top) & (self.y - r < view.bottom))
+        return np.flatnonzero(inside)
+
+    def draw(self, screen, offset_x, offset_y, indices, alpha=1.0, scale=1.0):
+        if len(indices) == 0:
+            return
+        px = self.px[indices]
+        py = self.py[indices]
+        x = px + (self.x[indices] - px) * alpha
+        y = py + (self.y[indices] - py) * alpha
+        blit_groups(screen, self.shape, x - offset_x, y - offset_y, self.radius[indices], self.color[indices],
+                    scale)
+
+    def __len__(self):
+        return len(self.x)
+
+
+class RenderSnapshot:
+    # Everything the renderer reads from one tick, captured on the simulation
+    # thread. Only entities within view_size (plus a margin) of the player
+    # are copied
+    def __init__(self, sim, view_size, alpha=1.0):
+        player = sim.player
+        # A shallow copy is enough, drawing only reads the scalar stats
+        self.player = copy.copy(player)
+        self.alpha = alpha
+        self.ticks = sim.ticks
+        self.elapsed = sim.elapsed
+        self.game_over = sim.game_over
+        self.level_up_pending = sim.level_up_pending
+        width, height = view_size
+        view = pygame.Rect(int(player.x - width // 2 - SNAPSHOT_MARGIN), int(player.y - height // 2 - SNAPSHOT_MARGIN),
+                           width + 2 * SNAPSHOT_MARGIN, height + 2 * SNAPSHOT_MARGIN)
+
+        enemies = sim.enemies
+        idx = enemies.visible(view)
+        self.enemies = SpriteFrame('diamond', enemies.x[idx], enemies.y[idx], enemies._px[idx], enemies._py[idx],
+                                   enemies.radius[idx], enemies.color[idx])
+        self.enemy_count = len(enemies)
+
+        orbs = sim.orbs.visible(view)
+        xs = np.array([orb.x for orb in orbs], dtype=np.float64)
+        ys = np.array([orb.y for orb in orbs], dtype=np.float64)
+        self.orbs = SpriteFrame('circle', xs, ys, xs, ys, np.array([orb.radius for orb in orbs], dtype=np.int64),
+                                np.array([orb.color for orb in orbs], dtype=np.int64).reshape(-1, 3))
+        self.orb_count = len(sim.orbs)
+
+        if isinstance(player, ArcaneMage):
+            arrows = player.arrows
+            slots = arrows.visible(view)
+            self.arrows = SpriteFrame('circle', arrows.x[slots], arrows.y[slots], arrows.px[slots], arrows.py[slots],
+                                      np.full(len(slots), arrows.radius), np.tile(arrows.color, (len(slots), 1)))
+            self.arrow_count = len(arrows)
+        else:
+            self.arrows = None
+            self.arrow_count = 0
+
+
+class SimulationWorker:
+    # Runs the simulation ticks of a frame on a background thread while the
+    # main thread draws the previous frame's snapshot. One job is in flight at
+    # a time and each result slot holds one snapshot, so with the one being
+    # drawn at most two snapshots exist (a double buffer)
+    def __init__(self, view_size):
+        self.view_size = view_size
+        self.jobs = queue.Queue(maxsize=1)
+        self.results = queue.Queue(maxsize=1)
+        self.busy = False
+        self.thread = threading.Thread(target=self.work, daemon=True, name="simulation")
+        self.thread.start()
+
+    def submit(self, sim, ticks, dt, controls, shots=0, recorder=None, alpha=1.0):
+        # The main thread must leave sim alone until collect() returns
+        self.busy = True
+        self.jobs.put((sim, ticks, dt, controls, shots, recorder, alpha))
+
+    def collect(self):
+        # Wait for the submitted job, returns its RenderSnapshot
+        result = self.results.get()
+        self.busy = False
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                self.results.put(self.run_job(*job))
+            except Exception as e:
+                self.results.put(e)
+
+    def run_job(self, sim, ticks, dt, controls, shots, recorder, alpha):
+        # Shots first, they were clicked before these ticks, then step until
+        # the ticks run out or the run needs the player's attention
+        for _ in range(shots):
+            sim.shoot()
+            if recorder:
+                recorder.shoot()
+        for _ in range(ticks):
+            if recorder:
+                recorder.tick(controls)
+            sim.step(dt, controls)
+            if sim.game_over or sim.level_up_pending:
+                break
+        return RenderSnapshot(sim, self.view_size, alpha)
+
+    def close(self):
+        self.jobs.put(None)
@@ -0,0 +1,152 @@
+import csv
+import json
+import time
+import numpy as np
+
+# Phases in the order they show up in the overlay and the stream columns
+PHASES = ('events', 'player', 'arrows', 'orbs', 'spawn', 'enemy_move', 'separation',
+          'contact', 'draw_world', 'draw_hud', 'draw', 'flip', 'sim_wait')
+# Entity counts recorded alongside each frame
+COUNTS = ('enemies', 'orbs', 'arrows', 'drawn')
+
+
+class FrameProfiler:
+    # Lap timer for the phases of a frame. Per-phase and total frame times go
+    # into ring buffers of the last `capacity` frames. While disabled every
+    # call returns immediately, so the hooks can stay in the hot loop
+    def __init__(self, capacity=600, enabled=False, stream_path=None):
+        self.capacity = capacity
+        self.frame_ms = np.zeros(capacity)
+        self.phase_ms = {name: np.zeros(capacity) for name in PHASES}
+        self.index = 0
+        self.filled = 0
+        self.frames = 0
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.counts = {}
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.stream = None
+        self.writer = None
+        self.enabled = False
+        if stream_path:
+            self.open_stream(stream_path)
+        if enabled or stream_path:
+            self.enable()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def open_stream(self, path):
+        # One row per frame, CSV or JSON lines depending on the extension
+        self.stream = open(path, 'w', newline='')
+        if path.endswith('.csv'):
+            self.writer = csv.writer(self.stream)
+            self.writer.writerow(('frame', 'frame_ms') + PHASES + tuple('n_' + name for name in COUNTS))
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+            self.writer = None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame_start = now
+        self.last = now
+        current = self.current
+        for name in current:
+            current[name] = 0.0
+
+    def lap(self, phase):
+        # Charge the time since the previous lap to phase
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += (now - self.last) * 1000.0
+        self.last = now
+
+    def end_frame(self, **counts):
+        if not self.enabled:
+            return
+        frame = (time.perf_counter() - self.frame_start) * 1000.0
+        i = self.index
+        self.frame_ms[i] = frame
+        for name, value in self.current.items():
+            self.phase_ms[name][i] = value
+        self.index = (i + 1) % self.capacity
+        self.filled = min(self.filled + 1, self.capacity)
+        self.frames += 1
+        self.counts = counts
+        if self.stream:
+            self.write_row(frame, counts)
+
+    def write_row(self, frame, counts):
+        if self.writer:
+            self.writer.writerow([self.frames, round(frame, 4)]
+                                 + [round(self.current[name], 4) for name in PHASES]
+                                 + [counts.get(name, 0) for name in COUNTS])
+        else:
+            row = {'frame': self.frames, 'frame_ms': round(frame, 4)}
+            row.update((name, round(value, 4)) for name, value in self.current.items())
+            row['counts'] = counts
+            self.stream.write(json.dumps(row) + "\n")
+
+    def stats(self):
+        # Mean ms per phase and frame time percentiles over the buffer
+        n = self.filled
+        if n == 0:
+            return None
+        frames = self.frame_ms[:n]
+        p50, p95, p99 = np.percentile(frames, (50, 95, 99))
+        return {
+            'frames': n,
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(frames.max()),
+            'phases': {name: float(self.phase_ms[name][:n].mean()) for name in PHASES},
+        }
+
+
+# Shared always-disabled profiler for code that runs without one
+NULL_PROFILER = FrameProfiler(capacity=1)
+
+
+class ProfilerOverlay:
+    # Text panel with the profiler numbers, refreshed a few times a second so
+    # the overlay itself stays cheap
+    def __init__(self, profiler, font, refresh_frames=15):
+        self.profiler = profiler
+        self.font = font
+        self.refresh_frames = refresh_frames
+        self.lines = []
+        self.age = refresh_frames
+
+    def refresh(self):
+        stats = self.profiler.stats()
+        if stats is None:
+            self.lines = []
+            return
+        lines = [f"frame p50 {stats['p50']:.2f}  p95 {stats['p95']:.2f}  p99 {stats['p99']:.2f}  max {stats['max']:.2f} ms"]
+        for name, value in stats['phases'].items():
+            if value > 0:
+                lines.append(f"{name:<11} {value:7.3f} ms")
+        counts = self.profiler.counts
+        if counts:
+            lines.append("  ".join(f"{key} {value}" for key, value in counts.items()))
+        # Rendered directly, these lines change too often to be worth caching
+        self.lines = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+
+    def draw(self, screen, x, y):
+        self.age += 1
+        if self.age >= self.refresh_frames:
+            self.age = 0
+            self.refresh()
+        for surface in self.lines:
+            screen.blit(surface, (x, y))
+            y += surface.get_height() + 2
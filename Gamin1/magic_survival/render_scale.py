@@ -0,0 +1,66 @@
+# The world layer can be drawn at a fraction of the native resolution and
+# stretched to the screen once per frame, which cuts fill and blit cost on
+# large displays. The HUD is always drawn at native resolution on top
+
+# Scales auto mode steps through, from full resolution down
+RENDER_SCALES = (1.0, 0.85, 0.7, 0.6, 0.5)
+MIN_RENDER_SCALE = 0.25
+
+
+def parse_render_scale(text):
+    # CLI value: 'auto' or a fraction of native resolution
+    if text == 'auto':
+        return text
+    scale = float(text)
+    if not MIN_RENDER_SCALE <= scale <= 1.0:
+        raise ValueError(f"render scale must be between {MIN_RENDER_SCALE} and 1")
+    return scale
+
+
+class AutoRenderScale:
+    # Picks the render scale that holds target_fps. Every `window` frames the
+    # 90th percentile of the frame work time is compared with the frame
+    # budget: over it drops a step, under headroom times it goes back up a
+    # step. The gap between the two keeps it from flipping every window.
+    # The stretch to native size is done on the CPU and costs a full-screen
+    # pass of its own, so a step down that doesn't make frames faster is
+    # undone and not tried again
+    def __init__(self, target_fps, scales=RENDER_SCALES, window=60, headroom=0.6, min_gain=0.05):
+        self.budget_ms = 1000.0 / target_fps
+        self.scales = scales
+        self.window = window
+        self.headroom = headroom
+        self.min_gain = min_gain
+        self.index = 0
+        self.lowest = len(scales) - 1  # Furthest step down still worth trying
+        self.stepped_down_from = None  # p90 before the last step down
+        self.samples = []
+
+    @property
+    def scale(self):
+        return self.scales[self.index]
+
+    def update(self, frame_ms):
+        # Feed one frame's work time (without the frame cap's sleep), returns
+        # the scale to render the next frame at
+        self.samples.append(frame_ms)
+        if len(self.samples) < self.window:
+            return self.scale
+        self.samples.sort()
+        p90 = self.samples[int(len(self.samples) * 0.9)]
+        self.samples = []
+        previous, self.stepped_down_from = self.stepped_down_from, None
+        if previous is not None and p90 > previous * (1.0 - self.min_gain):
+            # The last step down cost more than it saved
+            self.index -= 1
+            self.lowest = self.index
+        elif p90 > self.budget_ms and self.index < self.lowest:
+            self.index += 1
+            self.stepped_down_from = p90
+        elif p90 < self.budget_ms * self.headroom and self.index > 0:
+            self.index -= 1
+        return self.scale
+
+    def reset(self):
+        self.samples = []
+        self.stepped_down_from = None
@@ -0,0 +1,206 @@
+import argparse
+import struct
+import sys
+import time
+from player import ArcaneMage, Controls
+from simulation import Simulation
+from profiler import FrameProfiler
+
+# Input recordings: everything needed to re-run a session tick for tick.
+#
+#   python main.py --record run.dmr           record while playing
+#   python replay.py run.dmr                  re-run headless, check the end state
+#   python replay.py run.dmr --repeat 20      the same run as a fixed workload
+#
+# Layout, little endian:
+#   header   magic, version, sim rate, seed, enemy spawn time, enemy speed,
+#            enemy LOD near distance, then the class name as a length-prefixed utf-8 string
+#   records  one byte per tick: bits 0-4 up/down/left/right/sprint,
+#            EVENTS -> a count byte and one byte per event follow,
+#            NO_STEP -> apply the events without stepping (events after the
+#            last tick), END -> the final state digest follows
+# Events are SHOOT, or UPGRADE + the upgrade's index in Player.upgrades.
+
+MAGIC = b'DMRP'
+VERSION = 2
+HEADER = struct.Struct('<4sBHQddd')
+
+EVENTS = 0x20
+NO_STEP = 0x40
+END = 0x80
+
+SHOOT = 0
+UPGRADE = 1
+
+
+def pack_controls(controls):
+    return (controls.up | controls.down << 1 | controls.left << 2
+            | controls.right << 3 | controls.sprint << 4)
+
+
+def unpack_controls(bits):
+    return Controls(up=bool(bits & 1), down=bool(bits & 2), left=bool(bits & 4),
+                    right=bool(bits & 8), sprint=bool(bits & 16))
+
+
+class InputRecorder:
+    # Writes a run's input as it is played. Shots and upgrade choices are
+    # queued and stored with the next tick, which is when they took effect
+    def __init__(self, path, sim, sim_rate):
+        self.file = open(path, 'wb')
+        self.sim = sim
+        self.upgrade_keys = list(sim.player.upgrades)
+        self.pending = []
+        name = sim.selected_class.encode('utf-8')
+        self.file.write(HEADER.pack(MAGIC, VERSION, sim_rate, sim.seed,
+                                    sim.base_enemy_spawn_time, sim.base_enemy_speed, sim.lod_near_dist))
+        self.file.write(bytes((len(name),)) + name)
+
+    def shoot(self):
+        self.pending.append(SHOOT)
+
+    def choose_upgrade(self, upgrade_key):
+        self.pending.append(UPGRADE + self.upgrade_keys.index(upgrade_key))
+
+    def write_record(self, flags):
+        if self.pending:
+            # Count is one byte, a longer burst is split over NO_STEP records
+            while len(self.pending) > 255:
+                self.file.write(bytes((NO_STEP | EVENTS, 255)) + bytes(self.pending[:255]))
+                del self.pending[:255]
+            self.file.write(bytes((flags | EVENTS, len(self.pending))) + bytes(self.pending))
+            self.pending = []
+        else:
+            self.file.write(bytes((flags,)))
+
+    def tick(self, controls):
+        # Call right before the simulation steps with these controls
+        self.write_record(pack_controls(controls))
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.pending:
+            self.write_record(NO_STEP)
+        self.file.write(bytes((END,)) + self.sim.state_digest())
+        self.file.close()
+        self.file = None
+
+
+class Recording:
+    def __init__(self, sim_rate, seed, base_enemy_spawn_time, base_enemy_speed, lod_near_dist, selected_class, records,
+                 digest):
+        self.sim_rate = sim_rate
+        self.seed = seed
+        self.base_enemy_spawn_time = base_enemy_spawn_time
+        self.base_enemy_speed = base_enemy_speed
+        self.lod_near_dist = lod_near_dist  # Depends on the recording's screen size
+        self.selected_class = selected_class
+        self.records = records  # (controls or None for NO_STEP, events)
+        self.digest = digest  # None if the recording was cut off
+
+    def ticks(self):
+        return sum(1 for controls, _ in self.records if controls is not None)
+
+    def simulation(self):
+        return Simulation(self.selected_class, self.base_enemy_spawn_time, self.base_enemy_speed, seed=self.seed,
+                          lod_near_dist=self.lod_near_dist)
+
+
+def load_recording(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, sim_rate, seed, spawn_time, enemy_speed, lod_near_dist = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a recording")
+    if version != VERSION:
+        raise ValueError(f"{path} is recording version {version}, expected {VERSION}")
+    pos = HEADER.size
+    name_len = data[pos]
+    selected_class = data[pos + 1:pos + 1 + name_len].decode('utf-8')
+    pos += 1 + name_len
+    # Controls are shared between ticks with the same bits, most runs only
+    # ever use a handful of combinations
+    controls_for = {}
+    records = []
+    digest = None
+    while pos < len(data):
+        flags = data[pos]
+        pos += 1
+        if flags & END:
+            digest = data[pos:pos + 20]
+            break
+        events = ()
+        if flags & EVENTS:
+            count = data[pos]
+            events = tuple(data[pos + 1:pos + 1 + count])
+            pos += 1 + count
+        if flags & NO_STEP:
+            controls = None
+        else:
+            bits = flags & 0x1f
+            controls = controls_for.get(bits)
+            if controls is None:
+                controls = controls_for[bits] = unpack_controls(bits)
+        records.append((controls, events))
+    return Recording(sim_rate, seed, spawn_time, enemy_speed, lod_near_dist, selected_class, records, digest)
+
+
+def play(recording, profiler=None):
+    # Re-run a recording as fast as possible, returns the final simulation
+    sim = recording.simulation()
+    if profiler is not None:
+        sim.profiler = profiler
+    upgrade_keys = list(sim.player.upgrades)
+    dt = 1.0 / recording.sim_rate
+    for controls, events in recording.records:
+        for event in events:
+            if event == SHOOT:
+                sim.shoot()
+            else:
+                sim.choose_upgrade(upgrade_keys[event - UPGRADE])
+        if controls is not None:
+            if profiler is not None:
+                profiler.begin_frame()
+            sim.step(dt, controls)
+            if profiler is not None:
+                arrows = len(sim.player.arrows) if isinstance(sim.player, ArcaneMage) else 0
+                profiler.end_frame(enemies=len(sim.enemies), orbs=len(sim.orbs), arrows=arrows)
+    return sim
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run a recorded session headless")
+    parser.add_argument('path', help="recording made with main.py --record")
+    parser.add_argument('--repeat', type=int, default=1, help="run it this many times and report timings")
+    parser.add_argument('--profile-out', help="stream per-tick phase timings to a .csv or .jsonl file")
+    args = parser.parse_args(argv)
+
+    recording = load_recording(args.path)
+    ticks = recording.ticks()
+    print(f"{args.path}: {recording.selected_class}, seed {recording.seed}, {ticks} ticks at {recording.sim_rate} Hz "
+          f"({ticks / recording.sim_rate:.1f}s of play)")
+    profiler = FrameProfiler(stream_path=args.profile_out) if args.profile_out else None
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        sim = play(recording, profiler)
+        times.append(time.perf_counter() - start)
+    if profiler is not None:
+        profiler.close()
+    best = min(times)
+    print(f"best {best * 1000:.1f} ms over {args.repeat} run(s), {ticks / best:.0f} ticks/s")
+    print(f"final: level {sim.player.level}, health {sim.player.health}, xp {sim.xp_gained}, "
+          f"{sim.enemies_defeated} enemies defeated, {len(sim.enemies)} alive")
+    if recording.digest is None:
+        print("recording has no end digest (cut off?), final state not checked")
+        return 0
+    if sim.state_digest() != recording.digest:
+        print("MISMATCH: replay did not reach the recorded final state")
+        return 1
+    print("final state matches the recording")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
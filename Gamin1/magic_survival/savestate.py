@@ -0,0 +1,399 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+import numpy as np
+from player import Player, ArcaneMage
+from orb import Orb
+from simulation import Simulation
+import batch
+
+# Save states: the full state of a run in a compact binary file, loaded back
+# into a Simulation that carries on exactly as the saved one would have.
+#
+#   python savestate.py make late.dms --minutes 20     bot-play a run headless, save it
+#   python savestate.py info late.dms                  what's in it, how long loading takes
+#   python main.py --load late.dms                     play on from it (F5/F9 quick-save/load)
+#   python benchmark.py --state late.dms               benchmark at that load
+#
+# Layout, little endian, sections in this order:
+#   header    magic, version
+#   config    class name, then scalars: seed, enemy spawn time, enemy speed,
+#             level scaling, orb merge radius, enemy lod, invulnerable
+#   run       scalars: tick, elapsed, timers, counters, flags, evictions
+#   rng       random.Random state (625 uint32 + gauss), numpy PCG64 state
+#   spawner   timer, pending, then per wave count, period, timer
+#   player    scalars for every Player slot, ArcaneMage's on top, then one
+#             byte per upgrade level in Player.upgrades order
+#   enemies   count, next uid, then each swarm column as a packed array
+#   arrows    capacity, count, top, free list, then the columns up to top
+#   orbs      EntityStore tables, per-orb columns in dense order, and the
+#             pickup grid's buckets as dense indices
+# Scalars are a type byte (int, float, bool, None) and 8 bytes, so a value
+# comes back with the type it was saved with. Arrays are raw machine data
+# behind a length, loading them is a copy.
+
+MAGIC = b'DMSV'
+VERSION = 2
+HEADER = struct.Struct('<4sB')
+
+INT = 0
+FLOAT = 1
+BOOL = 2
+NONE = 3
+SCALAR = struct.Struct('<Bq')
+SCALAR_FLOAT = struct.Struct('<Bd')
+COUNT = struct.Struct('<I')
+
+CONFIG_FIELDS = ('seed', 'base_enemy_spawn_time', 'base_enemy_speed', 'level_scaling', 'orb_merge_radius',
+                 'enemy_lod', 'invulnerable')
+RUN_FIELDS = ('ticks', 'elapsed', 'spawn_timer', 'budget_timer', 'xp_gained', 'enemies_defeated',
+              'level_reached', 'game_time', 'last_health_increase_level', 'last_scaling_level', 'game_over',
+              'level_up_pending')
+PLAYER_FIELDS = tuple(name for name in Player.__slots__ if name != 'upgrades')
+MAGE_FIELDS = ('arrow_cooldown', 'kills')
+ENEMY_COLUMNS = ('_x', '_y', '_radius', '_speed', '_color', '_uid', '_px', '_py', '_owed')
+ARROW_COLUMNS = ('x', 'y', 'dx', 'dy', 'speed', 'active', 'age', 'px', 'py')
+WAVE = struct.Struct('<qdd')
+
+
+class StateWriter:
+    def __init__(self):
+        self.chunks = []
+
+    def scalar(self, value):
+        if value is None:
+            self.chunks.append(SCALAR.pack(NONE, 0))
+        elif isinstance(value, (bool, np.bool_)):
+            self.chunks.append(SCALAR.pack(BOOL, int(value)))
+        elif isinstance(value, (int, np.integer)):
+            self.chunks.append(SCALAR.pack(INT, int(value)))
+        else:
+            self.chunks.append(SCALAR_FLOAT.pack(FLOAT, float(value)))
+
+    def scalars(self, obj, names):
+        for name in names:
+            self.scalar(getattr(obj, name))
+
+    def count(self, n):
+        self.chunks.append(COUNT.pack(n))
+
+    def text(self, value):
+        data = value.encode('utf-8')
+        self.count(len(data))
+        self.chunks.append(data)
+
+    def array(self, values):
+        # numpy or array.array, length first
+        self.count(len(values))
+        self.chunks.append(values.tobytes() if isinstance(values, array) else np.ascontiguousarray(values).tobytes())
+
+    def raw(self, data):
+        self.chunks.append(data)
+
+    def getvalue(self):
+        return b''.join(self.chunks)
+
+
+class StateReader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.pos)
+        self.pos += layout.size
+        return values
+
+    def scalar(self):
+        kind = self.data[self.pos]
+        if kind == FLOAT:
+            return self.unpack(SCALAR_FLOAT)[1]
+        value = self.unpack(SCALAR)[1]
+        if kind == INT:
+            return value
+        if kind == BOOL:
+            return bool(value)
+        if kind == NONE:
+            return None
+        raise ValueError(f"bad scalar type {kind} at byte {self.pos - SCALAR.size}")
+
+    def scalars(self, obj, names):
+        for name in names:
+            setattr(obj, name, self.scalar())
+
+    def count(self):
+        return self.unpack(COUNT)[0]
+
+    def text(self):
+        n = self.count()
+        value = bytes(self.data[self.pos:self.pos + n]).decode('utf-8')
+        self.pos += n
+        return value
+
+    def raw(self, n):
+        data = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def array(self, dtype, width=1):
+        # Copy out a numpy array written by StateWriter.array, width is the
+        # row length of 2-d columns
+        n = self.count()
+        dtype = np.dtype(dtype)
+        values = np.frombuffer(self.raw(n * width * dtype.itemsize), dtype=dtype).copy()
+        return values.reshape(n, width) if width > 1 else values
+
+    def typed(self, typecode):
+        n = self.count()
+        values = array(typecode)
+        values.frombytes(self.raw(n * values.itemsize))
+        return values
+
+
+def dump_state(sim):
+    # The run as bytes, see the layout above
+    out = StateWriter()
+    out.raw(HEADER.pack(MAGIC, VERSION))
+    out.text(sim.selected_class)
+    out.scalars(sim, CONFIG_FIELDS)
+    out.scalars(sim, RUN_FIELDS)
+    out.scalar(sim.evicted['arrows'])
+    out.scalar(sim.evicted['orbs'])
+
+    version, mt, gauss = sim.rng.getstate()
+    out.scalar(version)
+    out.array(np.array(mt, dtype=np.uint32))
+    out.scalar(gauss)
+    bits = sim.np_rng.bit_generator.state
+    out.raw(bits['state']['state'].to_bytes(16, 'little') + bits['state']['inc'].to_bytes(16, 'little'))
+    out.scalar(bits['has_uint32'])
+    out.scalar(bits['uinteger'])
+
+    spawner = sim.spawner
+    out.scalar(spawner.timer)
+    out.scalar(spawner.pending)
+    out.count(len(spawner.waves))
+    for wave in spawner.waves:
+        out.raw(WAVE.pack(wave.count, wave.period, wave.timer))
+
+    player = sim.player
+    out.scalars(player, PLAYER_FIELDS)
+    if isinstance(player, ArcaneMage):
+        out.scalars(player, MAGE_FIELDS)
+    out.raw(bytes(upgrade['current_level'] for upgrade in player.upgrades.values()))
+
+    enemies = sim.enemies
+    out.count(enemies.count)
+    out.scalar(enemies.next_uid)
+    for name in ENEMY_COLUMNS:
+        out.array(getattr(enemies, name)[:enemies.count])
+
+    if isinstance(player, ArcaneMage):
+        arrows = player.arrows
+        out.count(len(arrows.x))
+        out.count(arrows.count)
+        out.count(arrows.top)
+        out.array(np.array(arrows.free, dtype=np.int64))
+        for name in ARROW_COLUMNS:
+            out.array(getattr(arrows, name)[:arrows.top])
+
+    store = sim.orbs.store
+    out.array(store.slots)
+    out.array(store.dense)
+    out.array(store.generations)
+    out.array(store.free)
+    items = store.items
+    out.array(np.array([orb.x for orb in items], dtype=np.float64))
+    out.array(np.array([orb.y for orb in items], dtype=np.float64))
+    out.array(np.array([orb.radius for orb in items], dtype=np.int64))
+    out.array(np.array([orb.color for orb in items], dtype=np.uint8).reshape(-1, 3))
+    out.array(np.array([orb.exp_value for orb in items], dtype=np.int64))
+    out.array(np.array([orb.born for orb in items], dtype=np.float64))
+    out.array(np.array([orb.handle for orb in items], dtype=np.int64))
+    # Bucket order decides pickup and merge order, so it is kept as is
+    dense_of = {id(orb): i for i, orb in enumerate(items)}
+    cells = sim.orbs.grid.cells
+    out.array(np.array(list(cells), dtype=np.int64).reshape(-1, 2))
+    out.array(np.array([len(bucket) for bucket in cells.values()], dtype=np.int64))
+    out.array(np.array([dense_of[id(orb)] for bucket in cells.values() for orb in bucket], dtype=np.int64))
+    return out.getvalue()
+
+
+def restore_state(data, budgets=None):
+    # A Simulation rebuilt from dump_state bytes. Budgets are settings rather
+    # than state and aren't saved, None gives the defaults
+    src = StateReader(data)
+    magic, version = src.unpack(HEADER)
+    if magic != MAGIC:
+        raise ValueError("not a save state")
+    if version != VERSION:
+        raise ValueError(f"save state version {version}, expected {VERSION}")
+    selected_class = src.text()
+    config = {name: src.scalar() for name in CONFIG_FIELDS}
+    sim = Simulation(selected_class, config['base_enemy_spawn_time'], config['base_enemy_speed'], seed=config['seed'],
+                     orb_merge_radius=config['orb_merge_radius'], level_scaling=config['level_scaling'],
+                     enemy_lod=config['enemy_lod'], budgets=budgets, invulnerable=config['invulnerable'])
+    src.scalars(sim, RUN_FIELDS)
+    sim.evicted = {'arrows': src.scalar(), 'orbs': src.scalar()}
+
+    version = src.scalar()
+    mt = tuple(int(v) for v in src.array(np.uint32))
+    sim.rng = random.Random()
+    sim.rng.setstate((version, mt, src.scalar()))
+    state = src.raw(32)
+    bits = sim.np_rng.bit_generator.state
+    bits['state'] = {'state': int.from_bytes(state[:16], 'little'), 'inc': int.from_bytes(state[16:], 'little')}
+    bits['has_uint32'] = src.scalar()
+    bits['uinteger'] = src.scalar()
+    sim.np_rng.bit_generator.state = bits
+
+    spawner = sim.spawner
+    spawner.timer = src.scalar()
+    spawner.pending = src.scalar()
+    for _ in range(src.count()):
+        count, period, timer = src.unpack(WAVE)
+        spawner.add_wave(count, period).timer = timer
+
+    player = sim.player
+    src.scalars(player, PLAYER_FIELDS)
+    if isinstance(player, ArcaneMage):
+        src.scalars(player, MAGE_FIELDS)
+    # Levels only, the stats they raised were restored with the other fields
+    levels = src.raw(len(player.upgrades))
+    for upgrade, level in zip(player.upgrades.values(), levels):
+        upgrade['current_level'] = level
+
+    enemies = sim.enemies
+    n = src.count()
+    enemies.next_uid = src.scalar()
+    enemies._grow(n)
+    for name in ENEMY_COLUMNS:
+        column = getattr(enemies, name)
+        column[:n] = src.array(column.dtype, column.shape[1] if column.ndim > 1 else 1)
+    enemies.count = n
+    enemies.grid_dirty = True
+
+    if isinstance(player, ArcaneMage):
+        arrows = player.arrows
+        arrows._allocate(src.count())
+        arrows.count = src.count()
+        arrows.top = src.count()
+        arrows.free = src.array(np.int64).tolist()
+        for name in ARROW_COLUMNS:
+            column = getattr(arrows, name)
+            column[:arrows.top] = src.array(column.dtype)
+
+    field = sim.orbs
+    store = field.store
+    store.slots = src.typed('q')
+    store.dense = src.typed('q')
+    store.generations = src.typed('q')
+    store.free = src.typed('q')
+    xs = src.array(np.float64).tolist()
+    ys = src.array(np.float64).tolist()
+    radii = src.array(np.int64).tolist()
+    colors = [tuple(color) for color in src.array(np.uint8, 3).tolist()]
+    exp_values = src.array(np.int64).tolist()
+    born = src.array(np.float64).tolist()
+    handles = src.array(np.int64).tolist()
+    items = []
+    for x, y, radius, color, exp_value, when, handle in zip(xs, ys, radii, colors, exp_values, born, handles):
+        orb = Orb(x, y, radius, color, exp_value, when)
+        orb.handle = handle
+        items.append(orb)
+    store.items = items
+    keys = src.array(np.int64, 2).tolist()
+    sizes = src.array(np.int64).tolist()
+    members = src.array(np.int64).tolist()
+    cells = field.grid.cells
+    start = 0
+    for key, size in zip(keys, sizes):
+        cells[tuple(key)] = [items[i] for i in members[start:start + size]]
+        start += size
+    return sim
+
+
+def save_state(sim, path):
+    # Written next to path and renamed over it, a crash mid-save leaves the
+    # old file intact
+    data = dump_state(sim)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def load_state(path, budgets=None):
+    with open(path, 'rb') as f:
+        return restore_state(f.read(), budgets)
+
+
+def make_state(minutes, policy='kite', strategy='offense', seed=0, spawn_time=1.5, enemy_speed=2.0,
+               invulnerable=True):
+    # Bot-play a run headless for the given simulated minutes, the quick way
+    # to a late-game state. Invulnerable keeps the bot alive to the end, the
+    # returned run is an ordinary one that can be lost again
+    sim = Simulation(base_enemy_spawn_time=spawn_time, base_enemy_speed=enemy_speed, seed=seed,
+                     invulnerable=invulnerable)
+    batch.play_bot(sim, policy, strategy, random.Random(seed), int(minutes * 60 * batch.SIM_RATE))
+    sim.invulnerable = False
+    return sim
+
+
+def describe(sim):
+    arrows = len(sim.player.arrows) if isinstance(sim.player, ArcaneMage) else 0
+    return (f"{sim.selected_class}, seed {sim.seed}, {sim.elapsed:.0f}s in ({sim.ticks} ticks), "
+            f"level {sim.player.level}, {len(sim.enemies)} enemies, {len(sim.orbs)} orbs, {arrows} arrows")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Make and inspect save states")
+    commands = parser.add_subparsers(dest='command', required=True)
+    make = commands.add_parser('make', help="bot-play a headless run and save its end state")
+    make.add_argument('path')
+    make.add_argument('--minutes', type=float, default=20.0, help="simulated minutes to play")
+    make.add_argument('--policy', choices=batch.POLICIES, default='kite')
+    make.add_argument('--strategy', choices=batch.STRATEGIES, default='offense')
+    make.add_argument('--seed', type=int, default=0)
+    make.add_argument('--spawn-time', type=float, default=1.5, help="base enemy spawn time")
+    make.add_argument('--enemy-speed', type=float, default=2.0, help="base enemy speed")
+    make.add_argument('--mortal', action='store_true', help="let the bot die instead of playing the full time")
+    info = commands.add_parser('info', help="summarize a save state and time loading it")
+    info.add_argument('path')
+    info.add_argument('--repeat', type=int, default=20, help="loads to time")
+    args = parser.parse_args(argv)
+
+    if args.command == 'make':
+        start = time.perf_counter()
+        sim = make_state(args.minutes, args.policy, args.strategy, args.seed, args.spawn_time, args.enemy_speed,
+                         invulnerable=not args.mortal)
+        played = time.perf_counter() - start
+        size = save_state(sim, args.path)
+        print(f"played {sim.elapsed:.0f}s in {played:.1f}s, wrote {size} bytes to {args.path}")
+        print(describe(sim))
+        if sim.game_over:
+            print(f"warning: the bot died after {sim.elapsed:.0f}s of {args.minutes * 60:.0f}s, "
+                  f"the state is a lost run", file=sys.stderr)
+            return 1
+        return 0
+
+    with open(args.path, 'rb') as f:
+        data = f.read()
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        sim = restore_state(data)
+        times.append(time.perf_counter() - start)
+    print(f"{args.path}: {len(data)} bytes, version {data[4]}")
+    print(describe(sim))
+    print(f"load best {min(times) * 1000:.2f} ms, median {sorted(times)[len(times) // 2] * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import hashlib
+import math
+import random
+import numpy as np
+import pygame
+from player import Player, ArcaneMage, Controls, BASE_TICK_RATE, KILL_EXP
+from orb import OrbField
+from swarm import EnemySwarm, LOD_NEAR_DIST
+from spawner import EnemySpawner, ring_points
+from profiler import NULL_PROFILER
+from budgets import default_budgets, BUDGET_CHECK_TIME
+
+# Spatial grid cell size, must cover two enemy radii so touching enemies are
+# always in the same or neighbouring cells
+ENEMY_GRID_CELL = 32
+
+# Spawning ring around the player
+SPAWN_MIN_DIST = 500
+SPAWN_MAX_DIST = 800
+SPAWN_JITTER = 50
+ORB_SPAWN_TIME = 0.5
+# Enemy speed and spawn rate multiplier applied every 5 levels
+LEVEL_SCALING = 1.5
+
+NO_INPUT = Controls()
+
+
+class Simulation:
+    # All game state and rules of a run, stepped with an explicit dt. Needs no
+    # window, fonts or event queue so it can run headless and faster than
+    # real time; Game wraps it with input and drawing
+    def __init__(self, selected_class="Arcane Mage", base_enemy_spawn_time=1.5, base_enemy_speed=2.0, seed=None,
+                 orb_merge_radius=None, level_scaling=LEVEL_SCALING, enemy_lod=True, budgets=None,
+                 lod_near_dist=LOD_NEAR_DIST, invulnerable=False):
+        self.selected_class = selected_class
+        self.orb_merge_radius = orb_merge_radius
+        # Base values for scaling
+        self.base_enemy_spawn_time = base_enemy_spawn_time
+        self.base_enemy_speed = base_enemy_speed
+        self.level_scaling = level_scaling
+        # Spawn interval in seconds that ignores level scaling, None scales
+        # base_enemy_spawn_time as usual. Stress runs pin the rate with it
+        self.forced_spawn_time = None
+        # Distance-based level of detail for enemy updates, see swarm.py.
+        # Enemies within lod_near_dist of the player get full updates, Game
+        # sets it from the screen size
+        self.enemy_lod = enemy_lod
+        self.lod_near_dist = lod_near_dist
+        # EntityBudget per kind ('arrows', 'orbs'), a kind left out is unbounded
+        self.budgets = default_budgets() if budgets is None else budgets
+        self.seed = seed
+        # Enemies still break on contact but do no damage and the run can't be
+        # lost, for bots that have to play on for a set time
+        self.invulnerable = invulnerable
+        # Phase timings go here, swap in an enabled FrameProfiler to measure
+        self.profiler = NULL_PROFILER
+        self.reset()
+
+    def reset(self):
+        self.rng = random.Random(self.seed)
+        # Batch placement draws from numpy, seeded from rng so a run still
+        # depends only on its seed
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        if self.selected_class == "Arcane Mage":
+            self.player = ArcaneMage(0, 0)
+        else:
+            self.player = Player(0, 0)
+        self.orbs = OrbField(merge_radius=self.orb_merge_radius)
+        self.enemies = EnemySwarm(cell_size=ENEMY_GRID_CELL)
+        self.spawn_timer = 0.0
+        self.spawner = EnemySpawner()
+        self.budget_timer = 0.0
+        self.evicted = {'arrows': 0, 'orbs': 0}  # Entities removed by their budget this run
+        self.elapsed = 0.0
+        self.ticks = 0
+        self.xp_gained = 0
+        self.enemies_defeated = 0
+        self.level_reached = 1
+        self.game_time = 0
+        self.last_health_increase_level = 0
+        self.last_scaling_level = 0
+        self.game_over = False
+        self.level_up_pending = False
+
+    def apply_level_scaling(self):
+        # Health increase every 5 levels
+        if self.player.level >= self.last_health_increase_level + 5:
+            self.player.health += 20
+            self.last_health_increase_level = self.player.level
+
+        # Enemy speed and spawn rate scaling every 5 levels
+        if self.player.level >= self.last_scaling_level + 5:
+            self.last_scaling_level = self.player.level
+            # Update enemy speed for all existing enemies
+            self.enemies.scale_speed(self.level_scaling)  # Increase speed by 50% by default
+
+    def current_spawn_time(self):
+        if self.forced_spawn_time:
+            return self.forced_spawn_time
+        return self.base_enemy_spawn_time / (self.level_scaling ** (self.player.level // 5))
+
+    def current_enemy_speed(self):
+        return self.base_enemy_speed * (self.level_scaling ** (self.player.level // 5))
+
+    def spawn_point(self):
+        # Random point on the spawn ring around the player
+        rng = self.rng
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(SPAWN_MIN_DIST, SPAWN_MAX_DIST)
+        x = self.player.x + dist * math.cos(angle) + rng.randint(-SPAWN_JITTER, SPAWN_JITTER)
+        y = self.player.y + dist * math.sin(angle) + rng.randint(-SPAWN_JITTER, SPAWN_JITTER)
+        return x, y
+
+    def shoot(self):
+        if isinstance(self.player, ArcaneMage):
+            self.player.shoot_arrow(self.enemies)
+
+    def choose_upgrade(self, upgrade_key):
+        if not self.player.apply_upgrade(upgrade_key):
+            return False
+        self.level_up_pending = False
+        return True
+
+    def experience_earned(self):
+        # xp_gained only counts orb pickups, this adds the experience from kills
+        kills = self.player.kills if isinstance(self.player, ArcaneMage) else 0
+        return self.xp_gained + KILL_EXP * kills
+
+    def player_rect(self):
+        return pygame.Rect(self.player.x, self.player.y, self.player.width, self.player.height)
+
+    def collect_orbs(self, player_rect):
+        for orb in self.orbs.collect(player_rect, self.player.magnet_radius):
+            self.player.gain_experience(orb.exp_value)
+            self.xp_gained += orb.exp_value
+
+    def spawn_orbs(self, dt):
+        self.spawn_timer += dt
+        if self.spawn_timer >= ORB_SPAWN_TIME:
+            orbx, orby = self.spawn_point()
+            self.orbs.spawn(orbx, orby, born=self.elapsed)
+            self.spawn_timer = 0.0
+
+    def spawn_enemies(self, dt):
+        # Every enemy owed this tick at the current level's spawn time, placed
+        # on the spawn ring in one batch
+        count = self.spawner.update(dt, self.current_spawn_time())
+        if count:
+            xs, ys = ring_points(self.np_rng, self.player.x, self.player.y, count,
+                                 SPAWN_MIN_DIST, SPAWN_MAX_DIST, SPAWN_JITTER)
+            # Calculate current enemy speed based on level
+            self.enemies.spawn_many(xs, ys, speed=self.current_enemy_speed())
+
+    def enforce_budgets(self, dt):
+        self.budget_timer += dt
+        if self.budget_timer < BUDGET_CHECK_TIME:
+            return
+        self.budget_timer -= BUDGET_CHECK_TIME
+        player = self.player
+        budget = self.budgets.get('arrows')
+        if budget and isinstance(player, ArcaneMage):
+            self.evicted['arrows'] += player.arrows.enforce(budget, player.x, player.y, BASE_TICK_RATE)
+        budget = self.budgets.get('orbs')
+        if budget:
+            self.evicted['orbs'] += self.orbs.enforce(budget, player.x, player.y, self.elapsed)
+
+    def update_enemies(self, player_rect, dt):
+        # Movement, separation and contact each run as one kernel over the swarm
+        profiler = self.profiler
+        if self.enemy_lod:
+            near = self.enemies.update_lod(self.player.x, self.player.y, self.ticks, dt * BASE_TICK_RATE,
+                                           self.lod_near_dist)
+        else:
+            self.enemies.update(self.player.x, self.player.y, dt * BASE_TICK_RATE)
+            near = None
+        profiler.lap('enemy_move')
+        self.enemies.separate(near)
+        profiler.lap('separation')
+        hit_mask = self.enemies.contact_mask(player_rect)
+        hits = self.enemies.remove_mask(hit_mask)
+        if not self.invulnerable:
+            self.player.health -= 10 * hits
+        self.enemies_defeated += hits
+        profiler.lap('contact')
+
+    def state_digest(self):
+        # Fingerprint of the run state, two runs with the same digest ended up
+        # in the same place
+        player = self.player
+        digest = hashlib.sha1(repr((
+            self.ticks, player.x, player.y, player.health, player.level, player.experience,
+            self.xp_gained, self.enemies_defeated, len(self.orbs), self.game_over,
+        )).encode())
+        digest.update(self.enemies.x.tobytes())
+        digest.update(self.enemies.y.tobytes())
+        if isinstance(player, ArcaneMage):
+            slots = player.arrows.live_slots()
+            digest.update(player.arrows.x[slots].tobytes())
+            digest.update(player.arrows.y[slots].tobytes())
+        return digest.digest()
+
+    def snapshot_positions(self):
+        # Keep the pre-tick positions so rendering can interpolate between ticks
+        self.player.prev_x = self.player.x
+        self.player.prev_y = self.player.y
+        self.enemies.snapshot()
+        if isinstance(self.player, ArcaneMage):
+            self.player.arrows.snapshot()
+
+    def step(self, dt, controls=NO_INPUT):
+        # Advance the run by dt seconds with the given input
+        if self.game_over:
+            return
+        self.snapshot_positions()
+        self.ticks += 1
+        self.elapsed += dt
+        profiler = self.profiler
+        self.player.move(controls, dt)
+
+        # Apply level scaling
+        self.apply_level_scaling()
+        profiler.lap('player')
+
+        if isinstance(self.player, ArcaneMage):
+            self.player.update_arrow(dt, self.enemies)
+        profiler.lap('arrows')
+        player_rect = self.player_rect()
+        self.collect_orbs(player_rect)
+        profiler.lap('orbs')
+        self.spawn_orbs(dt)
+        self.spawn_enemies(dt)
+        self.enforce_budgets(dt)
+        profiler.lap('spawn')
+        self.update_enemies(player_rect, dt)
+        self.level_reached = self.player.level
+        self.game_time = int(self.elapsed)
+        if self.player.health <= 0 and not self.invulnerable:
+            self.game_over = True
+            return
+
+        # Check for level up
+        if self.player.experience >= self.player.experience_to_level:
+            self.player.level_up()
+            self.level_up_pending = True
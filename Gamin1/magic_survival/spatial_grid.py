@@ -0,0 +1,252 @@
+import math
+import numpy as np
+
+# Offsets of the neighbouring cells that come "after" a cell, so every pair of
+# neighbouring cells is visited exactly once when walking the grid
+FORWARD_NEIGHBOURS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=32):
+        # Cell size should be at least the largest interaction distance
+        # (e.g. two enemy radii) so neighbours are never more than one cell apart
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cell_of(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, item, x, y):
+        key = self.cell_of(x, y)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
+
+    def remove(self, item, x, y):
+        key = self.cell_of(x, y)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            return False
+        try:
+            bucket.remove(item)
+        except ValueError:
+            return False
+        if not bucket:
+            del self.cells[key]
+        return True
+
+    def query(self, x, y, radius):
+        # All items in cells overlapping the square around (x, y), callers do
+        # the exact distance / rect test themselves
+        cs = self.cell_size
+        min_cx = math.floor((x - radius) / cs)
+        max_cx = math.floor((x + radius) / cs)
+        min_cy = math.floor((y - radius) / cs)
+        max_cy = math.floor((y + radius) / cs)
+        found = []
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def query_rect(self, rect, margin=0):
+        # Items whose cell overlaps the rect grown by margin (use the largest
+        # item radius as margin so items centred just outside still count)
+        half_w = rect.width / 2 + margin
+        half_h = rect.height / 2 + margin
+        cs = self.cell_size
+        cx_mid = rect.x + rect.width / 2
+        cy_mid = rect.y + rect.height / 2
+        found = []
+        cells = self.cells
+        for cx in range(math.floor((cx_mid - half_w) / cs), math.floor((cx_mid + half_w) / cs) + 1):
+            for cy in range(math.floor((cy_mid - half_h) / cs), math.floor((cy_mid + half_h) / cs) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+
+# Cell keys pack (cx, cy) into one int64 so neighbouring cells are a fixed
+# offset apart: key(cx + ox, cy + oy) == key + ox * KEY_STRIDE + oy
+KEY_STRIDE = 1 << 32
+PAIR_OFFSETS = ((0, 0),) + FORWARD_NEIGHBOURS
+
+
+class ArrayGrid:
+    # Same cell layout as SpatialGrid but built over coordinate arrays, items
+    # are identified by their index into those arrays
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.order = np.empty(0, dtype=np.intp)
+        self.keys = np.empty(0, dtype=np.int64)
+
+    def cell_keys(self, xs, ys):
+        cx = np.floor_divide(xs, self.cell_size).astype(np.int64)
+        cy = np.floor_divide(ys, self.cell_size).astype(np.int64)
+        return cx * KEY_STRIDE + cy
+
+    def build(self, xs, ys):
+        # Sort items by cell so each cell is a contiguous run of self.order
+        keys = self.cell_keys(xs, ys)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def sorted_pairs(self):
+        # Index arrays (a, b) of every item pair sharing a cell or sitting in
+        # neighbouring cells, each pair exactly once. They are positions in
+        # cell-sorted order (self.order maps them back to items), gathering
+        # from arrays permuted by self.order is much more cache friendly
+        n = len(self.keys)
+        if n < 2:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        keys = self.keys
+        positions = np.arange(n)
+        firsts = []
+        seconds = []
+        for ox, oy in PAIR_OFFSETS:
+            target = keys + (ox * KEY_STRIDE + oy)
+            hi = np.searchsorted(keys, target, side='right')
+            if ox == 0 and oy == 0:
+                # Within a cell only pair with the items sorted after us
+                lo = positions + 1
+            else:
+                lo = np.searchsorted(keys, target, side='left')
+            counts = np.maximum(hi - lo, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            starts = np.cumsum(counts) - counts
+            firsts.append(np.repeat(positions, counts))
+            seconds.append(np.repeat(lo, counts) + (np.arange(total) - np.repeat(starts, counts)))
+        if not firsts:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def query(self, x, y, radius):
+        # Indices of items in cells overlapping the square around (x, y)
+        return self.query_box(x - radius, y - radius, x + radius, y + radius)
+
+    def query_box(self, min_x, min_y, max_x, max_y):
+        # Indices of items in cells overlapping the box, one key range per
+        # column of cells
+        cs = self.cell_size
+        cols = np.arange(math.floor(min_x / cs), math.floor(max_x / cs) + 1, dtype=np.int64)
+        if len(self.keys) == 0 or len(cols) == 0:
+            return np.empty(0, dtype=np.intp)
+        return self.key_ranges(cols * KEY_STRIDE + math.floor(min_y / cs),
+                               cols * KEY_STRIDE + math.floor(max_y / cs))
+
+    def neighbours(self, xs, ys):
+        # Broad phase for many query points at once: (query, item) index pairs
+        # for every item in the 3x3 block of cells around each point. Only
+        # valid for interaction distances up to one cell size
+        count = len(xs)
+        keys = self.keys
+        if count == 0 or len(keys) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        query_keys = self.cell_keys(xs, ys)
+        queries = np.arange(count)
+        firsts = []
+        seconds = []
+        for ox in (-1, 0, 1):
+            # The three cells of one column are a single contiguous key range
+            column = query_keys + ox * KEY_STRIDE
+            lo = np.searchsorted(keys, column - 1, side='left')
+            hi = np.searchsorted(keys, column + 1, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            starts = np.cumsum(counts) - counts
+            firsts.append(np.repeat(queries, counts))
+            seconds.append(np.repeat(lo, counts) + (np.arange(total) - np.repeat(starts, counts)))
+        if not firsts:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(firsts), self.order[np.concatenate(seconds)]
+
+    def key_ranges(self, lo_keys, hi_keys):
+        # Item indices for a batch of inclusive cell key ranges
+        keys = self.keys
+        lo = np.searchsorted(keys, lo_keys, side='left')
+        hi = np.searchsorted(keys, hi_keys, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.intp)
+        starts = np.cumsum(counts) - counts
+        return self.order[np.repeat(lo, counts) + (np.arange(total) - np.repeat(starts, counts))]
+
+    def ring(self, cx, cy, r):
+        # Items in the square ring of cells at Chebyshev distance r from (cx, cy)
+        if r == 0:
+            key = cx * KEY_STRIDE + cy
+            return self.key_ranges(np.array([key]), np.array([key]))
+        # Left and right columns are full runs, the columns between only
+        # contribute their top and bottom cell
+        inner = np.arange(cx - r + 1, cx + r, dtype=np.int64)
+        cols = np.concatenate((np.array([cx - r, cx + r], dtype=np.int64), inner, inner))
+        lo_y = np.concatenate((np.array([cy - r, cy - r]), np.full(len(inner), cy - r), np.full(len(inner), cy + r)))
+        hi_y = np.concatenate((np.array([cy + r, cy + r]), np.full(len(inner), cy - r), np.full(len(inner), cy + r)))
+        return self.key_ranges(cols * KEY_STRIDE + lo_y, cols * KEY_STRIDE + hi_y)
+
+    def nearest(self, xs, ys, x, y, k, max_range=None, max_rings=8):
+        # Indices of the k items closest to (x, y), nearest first, optionally
+        # limited to max_range. Expands rings of cells outward until the k
+        # best are provably found; if the neighbourhood is too sparse it falls
+        # back to a partial selection over every item
+        n = len(self.keys)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.intp)
+        k = min(k, n)
+        cs = self.cell_size
+        cx = math.floor(x / cs)
+        cy = math.floor(y / cs)
+        found = []
+        total = 0
+        for r in range(max_rings + 1):
+            ring = self.ring(cx, cy, r)
+            if len(ring):
+                found.append(ring)
+                total += len(ring)
+            # Anything not yet found is at least r cells away
+            covered = r * cs
+            range_done = max_range is not None and covered >= max_range
+            if total < k and not range_done:
+                continue
+            candidates = np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+            dist_sq = (xs[candidates] - x) ** 2 + (ys[candidates] - y) ** 2
+            if range_done:
+                keep = dist_sq <= max_range * max_range
+                return select_nearest(candidates[keep], dist_sq[keep], k)
+            if np.count_nonzero(dist_sq <= covered * covered) >= k:
+                return select_nearest(candidates, dist_sq, k)
+        # Sparse neighbourhood, look at everything
+        candidates = np.arange(len(xs))
+        dist_sq = (xs - x) ** 2 + (ys - y) ** 2
+        if max_range is not None:
+            keep = dist_sq <= max_range * max_range
+            candidates = candidates[keep]
+            dist_sq = dist_sq[keep]
+        return select_nearest(candidates, dist_sq, k)
+
+
+def select_nearest(candidates, dist_sq, k):
+    # Partial selection of the k smallest distances, only those k get sorted
+    if len(candidates) > k:
+        part = np.argpartition(dist_sq, k - 1)[:k]
+        candidates = candidates[part]
+        dist_sq = dist_sq[part]
+    return candidates[np.argsort(dist_sq, kind='stable')]
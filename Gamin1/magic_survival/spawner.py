@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class Wave:
+    # count enemies at once every period seconds
+    def __init__(self, count, period, delay=0.0):
+        if period <= 0:
+            # update() would never catch up on a wave that is always due
+            raise ValueError(f"wave period must be positive, got {period}")
+        self.count = count
+        self.period = period
+        self.timer = period - delay  # Reaches period after delay seconds
+
+
+class EnemySpawner:
+    # Turns elapsed time into a number of enemies owed. Leftover time carries
+    # over instead of being dropped, so the spawn rate holds at any tick rate
+    # even once the interval is shorter than a tick. Waves and one-off bursts
+    # come on top of the steady trickle
+    def __init__(self):
+        self.timer = 0.0
+        self.waves = []
+        self.pending = 0
+
+    def add_wave(self, count, period, delay=0.0):
+        wave = Wave(count, period, delay)
+        self.waves.append(wave)
+        return wave
+
+    def burst(self, count):
+        # Spawned all together on the next tick
+        self.pending += count
+
+    def update(self, dt, interval):
+        # Enemies due this tick with one spawned every interval seconds
+        self.timer += dt
+        due = 0
+        if interval > 0 and self.timer >= interval:
+            due = int(self.timer // interval)
+            self.timer -= due * interval
+        for wave in self.waves:
+            wave.timer += dt
+            while wave.timer >= wave.period:
+                wave.timer -= wave.period
+                due += wave.count
+        due += self.pending
+        self.pending = 0
+        return due
+
+    def clear(self):
+        self.timer = 0.0
+        self.waves = []
+        self.pending = 0
+
+
+def ring_points(rng, cx, cy, n, min_dist, max_dist, jitter):
+    # n random points on a ring around (cx, cy) in one batch, rng is a
+    # numpy Generator
+    angle = rng.uniform(0, 2 * np.pi, n)
+    dist = rng.uniform(min_dist, max_dist, n)
+    offsets = rng.integers(-jitter, jitter + 1, (2, n))
+    return cx + dist * np.cos(angle) + offsets[0], cy + dist * np.sin(angle) + offsets[1]
@@ -0,0 +1,78 @@
+import numpy as np
+import pygame
+
+
+class SpriteAtlas:
+    # Entity visuals rasterized once and reused every frame, keyed by
+    # (shape, radius, color). Each sprite is (2 * radius + 1) pixels square
+    # with the entity centre at (radius, radius)
+    def __init__(self):
+        self.sprites = {}
+
+    def get(self, shape, radius, color):
+        radius = int(radius)
+        color = tuple(int(c) for c in color)
+        key = (shape, radius, color)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.rasterize(shape, radius, color)
+            self.sprites[key] = sprite
+        return sprite
+
+    def rasterize(self, shape, radius, color):
+        size = radius * 2 + 1
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        if shape == 'diamond':
+            points = [(radius, 0), (radius * 2, radius), (radius, radius * 2), (0, radius)]
+            pygame.draw.polygon(sprite, color, points)
+        elif shape == 'circle':
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+        else:
+            raise ValueError(f"unknown sprite shape: {shape}")
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+
+
+ATLAS = SpriteAtlas()
+
+
+def blit_layer(screen, sprite, xs, ys, radius):
+    # One Surface.blits call for every entity sharing a sprite, xs/ys are
+    # screen-space centres
+    radius = int(radius)
+    left = (np.asarray(xs).astype(np.int64) - radius).tolist()
+    top = (np.asarray(ys).astype(np.int64) - radius).tolist()
+    screen.blits([(sprite, pos) for pos in zip(left, top)], False)
+
+
+def scaled_radius(radius, scale):
+    # Sprite radius on a surface drawn at scale times native resolution
+    return max(1, int(round(radius * scale)))
+
+
+def blit_groups(screen, shape, xs, ys, radii, colors, scale=1.0):
+    # Batched blits for entities with mixed radii/colors: one blits call per
+    # distinct (radius, color). With scale, xs/ys and radii are native screen
+    # pixels and screen is a surface scale times that size
+    if len(xs) == 0:
+        return
+    radii = np.asarray(radii).astype(np.int64)
+    if scale != 1.0:
+        xs = np.asarray(xs) * scale
+        ys = np.asarray(ys) * scale
+        radii = np.maximum(1, np.rint(radii * scale)).astype(np.int64)
+    colors = np.asarray(colors).astype(np.int64)
+    keys = (radii << 24) | (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+    first = keys[0]
+    if (keys == first).all():
+        blit_layer(screen, ATLAS.get(shape, radii[0], colors[0]), xs, ys, radii[0])
+        return
+    unique, inverse = np.unique(keys, return_inverse=True)
+    for group in range(len(unique)):
+        members = np.flatnonzero(inverse == group)
+        i = members[0]
+        blit_layer(screen, ATLAS.get(shape, radii[i], colors[i]), xs[members], ys[members], radii[i])
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Numbers for main.py --stress: frame time percentiles over a soak run and the
+# budgets a run has to stay within for a zero exit status, e.g.
+#
+#   python main.py --stress 60 --enemies 2000 --headless --max-p99 17.5
+#   python main.py --stress 600 --spawn-time 0.05 --policy kite --min-fps 55
+#   python main.py --stress 120 --wave 500:10 --wave 50:1 --max-p95 17
+
+# Budget name -> (stat it applies to, True if the stat must stay below it)
+BUDGETS = {
+    'max_p50': ('p50', True),
+    'max_p95': ('p95', True),
+    'max_p99': ('p99', True),
+    'max_frame': ('max', True),
+    'min_fps': ('fps', False),
+}
+
+
+def parse_wave(text):
+    # CLI value COUNT:PERIOD, count enemies at once every period seconds
+    count, sep, period = text.partition(':')
+    if not sep:
+        raise ValueError("a wave is COUNT:PERIOD, e.g. 500:10")
+    count = int(count)
+    period = float(period)
+    if count <= 0 or period <= 0:
+        raise ValueError("wave count and period must be positive")
+    return count, period
+
+
+def frame_stats(frame_ms):
+    # Percentiles, worst frame and mean rate of a list of frame times in ms.
+    # The first frame is left out, it pays for whatever ran before the loop
+    frames = np.asarray(frame_ms[1:] or frame_ms, dtype=np.float64)
+    if len(frames) == 0:
+        return None
+    p50, p95, p99 = np.percentile(frames, (50, 95, 99))
+    mean = float(frames.mean())
+    return {'frames': len(frames), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+            'max': float(frames.max()), 'mean': mean, 'fps': 1000.0 / mean if mean > 0 else 0.0}
+
+
+def check_budgets(stats, budgets):
+    # Budgets that were set and broken, as report lines
+    failures = []
+    for name, limit in budgets.items():
+        if limit is None:
+            continue
+        stat, below = BUDGETS[name]
+        value = stats[stat]
+        if (value > limit) if below else (value < limit):
+            failures.append(f"{stat} {value:.2f} {'>' if below else '<'} {limit:g} (--{name.replace('_', '-')})")
+    return failures
+
+
+def report(duration, frame, work, ticks, dropped_ticks, peaks):
+    # The summary printed at the end of a stress run
+    lines = [f"stress: {duration:.1f}s, {frame['frames']} frames, {frame['fps']:.1f} fps"]
+    lines.append(f"frame ms  p50 {frame['p50']:.2f}  p95 {frame['p95']:.2f}  p99 {frame['p99']:.2f}  "
+                 f"max {frame['max']:.2f}")
+    if work:
+        # Without the frame cap's sleep, the headroom left at the capped rate
+        lines.append(f"work ms   p50 {work['p50']:.2f}  p95 {work['p95']:.2f}  p99 {work['p99']:.2f}  "
+                     f"max {work['max']:.2f}")
+    # Ticks are dropped when a frame takes longer than the simulation will
+    # catch up on in one go
+    lines.append(f"ticks {ticks}" + (f", {dropped_ticks} dropped by slow frames" if dropped_ticks else ""))
+    lines.append("peak " + "  ".join(f"{name} {count}" for name, count in peaks.items()))
+    return lines
@@ -0,0 +1,423 @@
+import numpy as np
+import pygame
+from spatial_grid import ArrayGrid
+from sprites import blit_groups
+
+# Level of detail by distance from the player. Inside LOD_NEAR_DIST enemies
+# move and separate every tick, beyond it they skip separation and move every
+# LOD_MID_INTERVAL ticks, beyond LOD_FAR_DIST every LOD_FAR_INTERVAL ticks,
+# catching up on the steps they missed. The near radius has to cover half
+# the screen diagonal so the reduced updates stay off-screen; Game works it
+# out from the window, these are the headless defaults
+LOD_NEAR_DIST = 1500
+LOD_FAR_DIST = 2500
+LOD_MID_INTERVAL = 2
+LOD_FAR_INTERVAL = 4
+
+
+class EnemyView:
+    # Thin handle that reads and writes one slot of an EnemySwarm, for code
+    # that works with one enemy at a time
+    __slots__ = ('swarm', 'uid', 'index')
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+        self.uid = int(swarm.uid[index])
+
+    def slot(self):
+        # Slots move when other enemies are removed, fall back to a lookup by uid
+        swarm = self.swarm
+        if self.index < swarm.count and swarm._uid[self.index] == self.uid:
+            return self.index
+        found = np.flatnonzero(swarm.uid == self.uid)
+        if len(found) == 0:
+            raise LookupError("enemy is no longer in the swarm")
+        self.index = int(found[0])
+        return self.index
+
+    @property
+    def alive(self):
+        try:
+            self.slot()
+        except LookupError:
+            return False
+        return True
+
+    @property
+    def x(self):
+        return float(self.swarm._x[self.slot()])
+
+    @x.setter
+    def x(self, value):
+        self.swarm._x[self.slot()] = value
+        self.swarm.grid_dirty = True
+
+    @property
+    def y(self):
+        return float(self.swarm._y[self.slot()])
+
+    @y.setter
+    def y(self, value):
+        self.swarm._y[self.slot()] = value
+        self.swarm.grid_dirty = True
+
+    @property
+    def radius(self):
+        return float(self.swarm._radius[self.slot()])
+
+    @property
+    def speed(self):
+        return float(self.swarm._speed[self.slot()])
+
+    @speed.setter
+    def speed(self, value):
+        self.swarm._speed[self.slot()] = value
+
+    @property
+    def color(self):
+        return tuple(int(c) for c in self.swarm._color[self.slot()])
+
+    @property
+    def rect(self):
+        i = self.slot()
+        swarm = self.swarm
+        radius = swarm._radius[i]
+        return pygame.Rect(swarm._x[i] - radius, swarm._y[i] - radius, radius * 2, radius * 2)
+
+    def update(self, player_x, player_y):
+        swarm = self.swarm
+        i = self.slot()
+        dx = player_x - swarm._x[i]
+        dy = player_y - swarm._y[i]
+        dist = (dx * dx + dy * dy) ** 0.5
+        if dist > 0:
+            dx /= dist
+            dy /= dist
+        swarm._x[i] += dx * swarm._speed[i]
+        swarm._y[i] += dy * swarm._speed[i]
+
+    def separate(self, other):
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dist = (dx * dx + dy * dy) ** 0.5
+        min_dist = self.radius + other.radius
+        if dist < min_dist and dist > 0:
+            push = (min_dist - dist) / 2
+            dx /= dist
+            dy /= dist
+            self.x += dx * push
+            self.y += dy * push
+            other.x -= dx * push
+            other.y -= dy * push
+
+    def draw(self, screen, offset_x, offset_y):
+        screen_x = self.x - offset_x
+        screen_y = self.y - offset_y
+        radius = self.radius
+        diamond_points = [
+            (int(screen_x), int(screen_y - radius)),  # top
+            (int(screen_x + radius), int(screen_y)),  # right
+            (int(screen_x), int(screen_y + radius)),  # bottom
+            (int(screen_x - radius), int(screen_y))   # left
+        ]
+        pygame.draw.polygon(screen, self.color, diamond_points)
+
+    def __eq__(self, other):
+        return isinstance(other, EnemyView) and other.swarm is self.swarm and other.uid == self.uid
+
+    def __hash__(self):
+        return hash((id(self.swarm), self.uid))
+
+
+class EnemySwarm:
+    # Structure-of-arrays enemy container, every per-frame step is one
+    # vectorized kernel over all live enemies instead of a Python loop
+    def __init__(self, capacity=256, cell_size=32):
+        self.count = 0
+        self.next_uid = 0
+        self.grid = ArrayGrid(cell_size)
+        self.lod_grid = ArrayGrid(cell_size)  # Near enemies only, for LOD separation
+        # Set whenever positions or membership change after the last build
+        self.grid_dirty = True
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._x = np.zeros(capacity, dtype=np.float64)
+        self._y = np.zeros(capacity, dtype=np.float64)
+        self._radius = np.zeros(capacity, dtype=np.float64)
+        self._speed = np.zeros(capacity, dtype=np.float64)
+        self._color = np.zeros((capacity, 3), dtype=np.uint8)
+        self._uid = np.zeros(capacity, dtype=np.int64)
+        # Positions at the start of the current tick, for render interpolation
+        self._px = np.zeros(capacity, dtype=np.float64)
+        self._py = np.zeros(capacity, dtype=np.float64)
+        # Movement steps skipped by level of detail, applied on the next update
+        self._owed = np.zeros(capacity, dtype=np.float64)
+
+    def _columns(self):
+        return (self._x, self._y, self._radius, self._speed, self._color, self._uid, self._px, self._py,
+                self._owed)
+
+    def _grow(self, needed):
+        capacity = len(self._x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        old = self._columns()
+        self._allocate(capacity)
+        n = self.count
+        for new, prev in zip(self._columns(), old):
+            new[:n] = prev[:n]
+
+    # Live slices of the backing arrays, writes go straight to the swarm
+    @property
+    def x(self):
+        return self._x[:self.count]
+
+    @property
+    def y(self):
+        return self._y[:self.count]
+
+    @property
+    def radius(self):
+        return self._radius[:self.count]
+
+    @property
+    def speed(self):
+        return self._speed[:self.count]
+
+    @property
+    def color(self):
+        return self._color[:self.count]
+
+    @property
+    def uid(self):
+        return self._uid[:self.count]
+
+    def spawn(self, x, y, radius=15, color=(255, 0, 0), speed=1.5):
+        self._grow(self.count + 1)
+        i = self.count
+        self._x[i] = x
+        self._y[i] = y
+        self._radius[i] = radius
+        self._speed[i] = speed
+        self._color[i] = color
+        self._uid[i] = self.next_uid
+        self._px[i] = x
+        self._py[i] = y
+        self._owed[i] = 0.0
+        self.next_uid += 1
+        self.count += 1
+        self.grid_dirty = True
+        return EnemyView(self, i)
+
+    def spawn_many(self, xs, ys, radius=15, color=(255, 0, 0), speed=1.5):
+        # Batch spawn, one slice assignment per column
+        n = len(xs)
+        if n == 0:
+            return
+        self._grow(self.count + n)
+        start = self.count
+        end = start + n
+        self._x[start:end] = xs
+        self._y[start:end] = ys
+        self._radius[start:end] = radius
+        self._speed[start:end] = speed
+        self._color[start:end] = color
+        self._uid[start:end] = np.arange(self.next_uid, self.next_uid + n)
+        self._px[start:end] = xs
+        self._py[start:end] = ys
+        self._owed[start:end] = 0.0
+        self.next_uid += n
+        self.count = end
+        self.grid_dirty = True
+
+    def remove(self, enemy):
+        self.remove_index(enemy.slot())
+
+    def remove_index(self, i):
+        # Swap the last enemy into the hole, O(1)
+        last = self.count - 1
+        if i != last:
+            for arr in self._columns():
+                arr[i] = arr[last]
+        self.count = last
+        self.grid_dirty = True
+
+    def remove_mask(self, mask):
+        # Drop every enemy flagged in mask with one compaction pass
+        keep = ~mask
+        kept = int(np.count_nonzero(keep))
+        if kept == self.count:
+            return 0
+        n = self.count
+        for arr in self._columns():
+            arr[:kept] = arr[:n][keep]
+        self.count = kept
+        self.grid_dirty = True
+        return n - kept
+
+    def clear(self):
+        self.count = 0
+        self.grid_dirty = True
+
+    def ensure_grid(self):
+        # Rebuild the cell grid only if something moved or died since the last build
+        if self.grid_dirty:
+            self.grid.build(self.x, self.y)
+            self.grid_dirty = False
+        return self.grid
+
+    def snapshot(self):
+        # Remember where everyone is before a tick moves them
+        n = self.count
+        self._px[:n] = self._x[:n]
+        self._py[:n] = self._y[:n]
+
+    def interpolated(self, alpha, indices=None):
+        # Positions blended between the last two ticks, alpha in [0, 1]
+        n = self.count
+        x, y, px, py = self._x[:n], self._y[:n], self._px[:n], self._py[:n]
+        if indices is not None:
+            x, y, px, py = x[indices], y[indices], px[indices], py[indices]
+        return px + (x - px) * alpha, py + (y - py) * alpha
+
+    def update(self, player_x, player_y, steps=1.0):
+        # Seek kernel: glide every enemy toward the player at its own speed,
+        # speed is in pixels per 60 Hz step and steps is how many of those
+        # this tick covers
+        x = self.x
+        y = self.y
+        dx = player_x - x
+        dy = player_y - y
+        dist = np.hypot(dx, dy)
+        moving = dist > 0
+        scale = np.zeros_like(dist)
+        np.divide(self.speed * steps, dist, out=scale, where=moving)
+        x += dx * scale
+        y += dy * scale
+        self.grid_dirty = True
+
+    def update_lod(self, player_x, player_y, tick, steps=1.0, near_dist=LOD_NEAR_DIST, far_dist=None):
+        # Seek kernel with distance-based level of detail. Enemies are
+        # staggered by uid so each tick moves an even share of the far ones.
+        # far_dist defaults to near_dist plus the default mid band width.
+        # Returns the mask of near enemies, the ones that still separate
+        if far_dist is None:
+            far_dist = near_dist + (LOD_FAR_DIST - LOD_NEAR_DIST)
+        x = self.x
+        y = self.y
+        dx = player_x - x
+        dy = player_y - y
+        dist_sq = dx * dx + dy * dy
+        near = dist_sq < near_dist * near_dist
+        if near.all():
+            self.update(player_x, player_y, steps)
+            return near
+        interval = np.where(near, 1, np.where(dist_sq < far_dist * far_dist,
+                                              LOD_MID_INTERVAL, LOD_FAR_INTERVAL))
+        owed = self._owed[:self.count]
+        owed += steps
+        due = np.flatnonzero((tick + self.uid) % interval == 0)
+        dist = np.sqrt(dist_sq[due])
+        scale = np.zeros_like(dist)
+        np.divide(self.speed[due] * owed[due], dist, out=scale, where=dist > 0)
+        x[due] += dx[due] * scale
+        y[due] += dy[due] * scale
+        owed[due] = 0.0
+        self.grid_dirty = True
+        return near
+
+    def separate(self, mask=None):
+        # Separation kernel: candidate pairs come from the cell grid, every
+        # overlapping pair is pushed apart by half the overlap each way. With
+        # a mask only the flagged enemies take part, on a grid of their own
+        if mask is None or mask.all():
+            grid = self.ensure_grid()
+            members = None
+        else:
+            members = np.flatnonzero(mask)
+            grid = self.lod_grid
+            grid.build(self.x[members], self.y[members])
+        a, b = grid.sorted_pairs()
+        if len(a) == 0:
+            return
+        # Work in cell-sorted order so the pair gathers stay cache friendly
+        order = grid.order if members is None else members[grid.order]
+        x = self.x[order]
+        y = self.y[order]
+        r = self.radius[order]
+        dx = x[a] - x[b]
+        dy = y[a] - y[b]
+        dist_sq = dx * dx + dy * dy
+        min_dist = r[a] + r[b]
+        hit = (dist_sq < min_dist * min_dist) & (dist_sq > 0)
+        if not hit.any():
+            return
+        a = a[hit]
+        b = b[hit]
+        dist = np.sqrt(dist_sq[hit])
+        push = (min_dist[hit] - dist) / 2 / dist
+        px = dx[hit] * push
+        py = dy[hit] * push
+        n = len(order)
+        self.x[order] += np.bincount(a, px, n) - np.bincount(b, px, n)
+        self.y[order] += np.bincount(a, py, n) - np.bincount(b, py, n)
+        self.grid_dirty = True
+
+    def contact_mask(self, rect):
+        # Contact kernel: enemy bounding boxes overlapping rect
+        x = self.x
+        y = self.y
+        r = self.radius
+        return ((x - r < rect.right) & (x + r > rect.left)
+                & (y - r < rect.bottom) & (y + r > rect.top))
+
+    def nearest(self, x, y, k, max_range=None):
+        # Indices of the k enemies nearest to (x, y), closest first
+        return self.ensure_grid().nearest(self.x, self.y, x, y, k, max_range)
+
+    def scale_speed(self, factor):
+        self.speed[:] *= factor
+
+    def visible(self, view, margin=0):
+        # Indices of enemies whose bounding box overlaps the view rect, the
+        # grid narrows it down to the cells under the view first
+        if self.count == 0:
+            return np.empty(0, dtype=np.intp)
+        reach = margin + float(self.radius.max())
+        candidates = self.ensure_grid().query_box(view.left - reach, view.top - reach,
+                                                  view.right + reach, view.bottom + reach)
+        x = self.x[candidates]
+        y = self.y[candidates]
+        r = self.radius[candidates] + margin
+        inside = ((x + r >= view.left) & (x - r < view.right)
+                  & (y + r >= view.top) & (y - r < view.bottom))
+        return candidates[inside]
+
+    def draw(self, screen, offset_x, offset_y, indices=None, alpha=1.0, scale=1.0):
+        # Batched blits of cached diamond sprites, optionally only the given
+        # enemies (e.g. the visible ones), interpolated by alpha
+        x, y = self.interpolated(alpha, indices)
+        if indices is None:
+            blit_groups(screen, 'diamond', x - offset_x, y - offset_y, self.radius, self.color, scale)
+        else:
+            blit_groups(screen, 'diamond', x - offset_x, y - offset_y,
+                        self.radius[indices], self.color[indices], scale)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter([EnemyView(self, i) for i in range(self.count)])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [EnemyView(self, i) for i in range(self.count)[key]]
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError("enemy index out of range")
+        return EnemyView(self, key)
@@ -0,0 +1,109 @@
+import csv
+import tracemalloc
+import numpy as np
+
+# Memory telemetry for long runs: traced Python memory and entity counts are
+# sampled every few seconds, and a line fitted through the recent samples
+# tells a steady state from something that keeps growing
+MEMORY_SAMPLE_TIME = 5.0  # Seconds between samples
+TREND_WINDOW = 12  # Samples the growth trend is fitted over
+TREND_MIN_SAMPLES = 4
+# Growth per minute above which a series is flagged
+GROWTH_LIMITS = {'traced_kb': 256.0}
+COUNT_GROWTH_LIMIT = 20.0
+
+
+class MemoryTelemetry:
+    # Starts tracemalloc unless something else already has, and stops it
+    # again on close. Tracing slows allocation down, only use it on runs
+    # that are watched for leaks
+    def __init__(self, interval=MEMORY_SAMPLE_TIME, window=TREND_WINDOW, frames=1):
+        self.interval = interval
+        self.window = window
+        self.owns_tracing = not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start(frames)
+        self.baseline = self.take_snapshot()
+        self.rows = []  # One dict per sample: time, traced_kb, peak_kb and the counts
+        self.next_time = 0.0
+
+    def take_snapshot(self):
+        # tracemalloc's own bookkeeping would show up as growth otherwise
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def sample(self, now, **counts):
+        # now is any clock in seconds, counts are named entity counts
+        current, peak = tracemalloc.get_traced_memory()
+        row = {'time': now, 'traced_kb': current / 1024, 'peak_kb': peak / 1024}
+        row.update(counts)
+        self.rows.append(row)
+        self.next_time = now + self.interval
+
+    def maybe_sample(self, now, **counts):
+        # Takes a sample if one is due, True if it did
+        if now < self.next_time:
+            return False
+        self.sample(now, **counts)
+        return True
+
+    def trends(self):
+        # Least squares slope per minute of every series over the last window
+        # samples, empty until there are enough of them
+        rows = self.rows[-self.window:]
+        if len(rows) < TREND_MIN_SAMPLES:
+            return {}
+        t = np.array([row['time'] for row in rows]) / 60.0
+        if t[-1] - t[0] <= 0:
+            return {}
+        slopes = {}
+        for name in rows[-1]:
+            if name in ('time', 'peak_kb'):
+                continue
+            values = np.array([row.get(name, 0) for row in rows], dtype=np.float64)
+            slopes[name] = float(np.polyfit(t, values, 1)[0])
+        return slopes
+
+    def growing(self, limits=None):
+        # Series whose trend is over its limit, name -> growth per minute
+        limits = GROWTH_LIMITS if limits is None else limits
+        return {name: slope for name, slope in self.trends().items()
+                if slope > limits.get(name, COUNT_GROWTH_LIMIT)}
+
+    def top_growth(self, limit=10):
+        # Source lines that allocated the most since telemetry started
+        stats = self.take_snapshot().compare_to(self.baseline, 'lineno')
+        return [stat for stat in stats if stat.size_diff > 0][:limit]
+
+    def report(self, top=5):
+        # Summary lines for the end of a run
+        if not self.rows:
+            return ["memory: no samples"]
+        last = self.rows[-1]
+        lines = [f"memory: {len(self.rows)} samples over {last['time'] - self.rows[0]['time']:.0f}s, "
+                 f"traced {last['traced_kb']:.0f} KiB, peak {last['peak_kb']:.0f} KiB"]
+        trends = self.trends()
+        if trends:
+            lines.append("trend per minute: " + "  ".join(f"{name} {slope:+.1f}" for name, slope in trends.items()))
+        for name, slope in self.growing().items():
+            lines.append(f"GROWING: {name} {slope:+.1f}/min")
+        for stat in self.top_growth(top):
+            frame = stat.traceback[0]
+            lines.append(f"  {frame.filename}:{frame.lineno} {stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks)")
+        return lines
+
+    def write_csv(self, path):
+        names = []
+        for row in self.rows:
+            names.extend(name for name in row if name not in names)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=names)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def close(self):
+        if self.owns_tracing:
+            tracemalloc.stop()
+            self.owns_tracing = False
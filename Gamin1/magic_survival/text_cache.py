@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import threading
+import pygame
+
+# Shared fonts, one pygame Font per (file, size) for the whole game
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+def get_font(name=None, size=24):
+    # name is a font file path or None for pygame's default font. A missing
+    # file falls back to the default font at the same size. Fonts belong on
+    # the main thread, the lock only keeps a stray call from another thread
+    # from opening a second face for the same key
+    key = (name, size)
+    with _fonts_lock:
+        font = _fonts.get(key)
+        if font is None:
+            try:
+                font = pygame.font.Font(name, size)
+            except (OSError, pygame.error):
+                font = pygame.font.Font(None, size)
+            _fonts[key] = font
+    return font
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, text, color), least recently
+    # used entries are evicted once the cache is full
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    return TEXT_CACHE.render(font, text, color, antialias)
+
+
+def clear_text_cache():
+    # Fonts and rendered surfaces belong to the current pygame.init(), drop
+    # them all before pygame.quit() so a later init starts clean
+    with _fonts_lock:
+        _fonts.clear()
+    TEXT_CACHE.clear()
+
+
+class TextLabel:
+    # Text that is only re-rendered when its value changes, for HUD values
+    # that stay the same for many frames
+    def __init__(self, font, template, color=(255, 255, 255)):
+        self.font = font
+        self.template = template
+        self.color = color
+        self.value = None
+        self.surface = None
+
+    def set(self, *values):
+        if values != self.value:
+            self.value = values
+            self.surface = render_text(self.font, self.template.format(*values), self.color)
+        return self.surface
+
+    def draw(self, screen, *values, **rect_args):
+        # rect_args position the text like Surface.get_rect, e.g. topright=(x, y)
+        surface = self.set(*values)
+        screen.blit(surface, surface.get_rect(**rect_args))